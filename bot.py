@@ -7,7 +7,11 @@ from dotenv import load_dotenv
 from discord import Guild
 from cogs.channel_control import load_allowed_channels
 from cogs.admin import AdminCog
+from core.registry import ServiceRegistry
 from core.session_manager import SessionManager
+from core.session_service import AsyncSessionService
+from utils.config_loader import load_config
+from utils.guild_db import GUILD_DB_NAME, create_guild_db
 
 load_dotenv()
 
@@ -44,6 +48,33 @@ intents.message_content = True
 intents.members = True  # Needed for on_member_join
 
 bot = commands.Bot(command_prefix=PREFIX, intents=intents)
+bot.services = ServiceRegistry()
+
+
+# ========== SHARED SERVICES ==========
+def register_services():
+    """Creates the services every cog shares; they live as long as the bot, not any one cog."""
+    config = load_config()
+    bot.services.register("sessions", AsyncSessionService(SessionManager(
+        db_path=config["session_db_path"],
+        max_sessions=config["max_sessions_per_user"],
+        flush_interval=config.get("session_flush_interval", 2),
+        max_staleness=config.get("session_max_staleness", 10),
+        cache_entries=config.get("session_cache_max_entries", 512),
+        cache_bytes=config.get("session_cache_max_mb", 64) * 1024 * 1024,
+        compression=config.get("session_compression", False),
+        compression_level=config.get("session_compression_level", 6),
+        # Sharding stores each guild's sessions in its bfl_root/<guild_id> database
+        shard_root=config["bfl_root"] if config.get("session_sharding", False) else None,
+        shard_file=GUILD_DB_NAME,
+        max_open_shards=config.get("session_shard_max_open", 32),
+        # Crash journal: every session change is fsynced here before the DB catches up
+        journal_path=config["temp_session_file"] if config.get("session_journal", True) else None,
+        journal_commit_interval=config.get("session_journal_commit_ms", 50) / 1000,
+        journal_checkpoint_bytes=config.get("session_journal_checkpoint_mb", 8) * 1024 * 1024,
+        # Cold tier under bfl_root/<guild_id>/archive; sessions only move there by retention policy
+        archive_root=config["bfl_root"]
+    )))
 
 
 
@@ -115,10 +146,13 @@ async def main():
     logger.info("[O-ni] Starting")
     try:
         async with bot:
+            register_services()
             await load_extensions()
             await bot.start(TOKEN)
     finally:
-        logger.info("[O-ni] Shutting down, flushing logs...")
+        logger.info("[O-ni] Shutting down, closing services...")
+        await bot.services.close_all()
+        logger.info("[O-ni] Flushing logs...")
         for handler in logger.handlers:
             handler.flush()
             handler.close()
@@ -3,7 +3,10 @@
 import discord
 from discord.ext import commands
 from utils.config_loader import load_config
-from core.session_manager import SessionManager
+from core.registry import get_services
+from utils.guild_settings import get_guild_setting, set_guild_setting
+from core.session_export import SessionExport
+import asyncio
 import zipfile
 import tempfile
 import logging
@@ -11,7 +14,6 @@ import shutil
 from datetime import datetime
 import os
 import json
-import sqlite3
 
 config = load_config()
 
@@ -26,8 +28,10 @@ if not logger.hasHandlers():
     logger.addHandler(ch)
 
 
-session_manager = SessionManager("data/servers/sessions.db")
 max_sessions=config["max_sessions_per_user"]
+# Export parts stay this far under the server's upload limit, and progress is posted this often (seconds)
+EXPORT_SIZE_MARGIN = 64 * 1024
+EXPORT_PROGRESS_INTERVAL = 5
 
 def is_owner(ctx):
     is_owner = ctx.author.id == ctx.guild.owner_id or ctx.author.guild_permissions.administrator
@@ -39,7 +43,7 @@ class AdminCog(commands.Cog):
         self.bot = bot
         logger.debug("[DEBUG] Initializing AdminCog")
 
-        self.sessions = session_manager
+        self.sessions = get_services(bot).get("sessions")
         self.db_path = self.sessions.db_path
 
         logger.debug(f"[DEBUG] SessionManager initialized with db_path={self.db_path} / max_sessions={max_sessions} / session_manager={self.sessions}")
@@ -91,10 +95,11 @@ class AdminCog(commands.Cog):
         logger.info(f"[USER] Shutdown command invoked by user {user_id} in guild {guild_id}")
         try:
             await ctx.send("Shutting down. Saving all temp sessions...")
-            self.sessions.filter_and_sync_sessions()
-            self.sessions.flush_all_to_disk()
-            self.sessions.temp_sessions.clear()
-            self.sessions.flush_all_to_disk()
+            ai_cog = self.bot.get_cog("AICog")
+            if ai_cog is not None:
+                # Stop in-flight replies first so their partial output is saved with everything else
+                await ai_cog.generations.cancel_all("bot shutting down")
+            await self.sessions.flush_and_clear()
             logger.info("[AI] Sessions flushed and memory cleared.")
             await ctx.send("O-ni has been shut down safely. Goodbye! 👋")
             await self.bot.close()
@@ -120,22 +125,119 @@ class AdminCog(commands.Cog):
             await ctx.send("⚠️ Failed to reload cogs!")
 
 
+    @commands.command(name="responsecache")
+    @commands.check(is_owner)
+    async def response_cache(self, ctx, mode: str = None):
+        """🗃 Turn the AI response cache on/off for this server, or show its stats."""
+        guild_id = ctx.guild.id
+        logger.info(f"[USER] responsecache {mode} invoked by user {ctx.author.id} in guild {guild_id}")
+
+        if mode in ("on", "off"):
+            set_guild_setting(guild_id, "response_cache", mode == "on")
+            await ctx.send(f"✅ Response cache turned **{mode}** for this server.")
+            return
+
+        ai_cog = self.bot.get_cog("AICog")
+        enabled = get_guild_setting(guild_id, "response_cache", True)
+        if ai_cog is None or ai_cog.cache is None:
+            await ctx.send(f"🗃 Response cache is disabled globally (server setting: {'on' if enabled else 'off'}).")
+            return
+
+        stats = ai_cog.cache.stats()
+        await ctx.send(
+            f"🗃 Response cache is **{'on' if enabled else 'off'}** for this server.\n"
+            f"Entries: `{stats['entries']}` | Hits: `{stats['hits']}` | Misses: `{stats['misses']}` | "
+            f"Coalesced: `{stats['coalesced']}` | Hit rate: `{stats['hit_rate']:.0%}`\n"
+            "Usage: `$responsecache on|off`"
+        )
+
+    @commands.command(name="sessioncache")
+    @commands.check(is_owner)
+    async def session_cache(self, ctx):
+        """🧠 Show how the in-memory session cache is doing."""
+        logger.info(f"[USER] sessioncache invoked by user {ctx.author.id} in guild {ctx.guild.id}")
+        stats = self.sessions.cache_stats()
+        compression = stats["compression"]
+        await ctx.send(
+            f"🧠 Session cache: `{stats['entries']}`/`{stats['max_entries']}` sessions, "
+            f"`{stats['bytes'] / 1024 / 1024:.1f}`/`{stats['max_bytes'] / 1024 / 1024:.0f}` MB\n"
+            f"Hits: `{stats['hits']}` | Misses: `{stats['misses']}` | Evictions: `{stats['evictions']}` | "
+            f"Hit rate: `{stats['hit_rate']:.0%}` | Unflushed: `{stats['dirty']}`"
+            + (f" | Journal: `{stats['journal_bytes'] / 1024:.0f}` KB" if stats["journal_bytes"] is not None else "") + "\n"
+            # The codec only counts what this process wrote; rows from before a restart are not in it
+            f"Compression: `{'on' if compression['enabled'] else 'off'}` | "
+            f"Written since startup: `{compression['raw_bytes'] / 1024:.0f}` KB → `{compression['stored_bytes'] / 1024:.0f}` KB "
+            f"(`{compression['ratio']:.2f}x` since startup)"
+            + (f"\nShards open: `{stats['shards']['open']}`/`{stats['shards']['max_open']}` | "
+               f"Opened: `{stats['shards']['opened']}` | Closed: `{stats['shards']['closed']}`" if stats["shards"] else "")
+        )
+
+    @commands.command(name="retention")
+    @commands.check(is_owner)
+    async def retention(self, ctx, idle_days: str = None, max_mb: float = None):
+        """🗄 Set how long sessions stay hot before moving to the archive, or run the sweep now."""
+        guild_id = ctx.guild.id
+        logger.info(f"[USER] retention {idle_days} {max_mb} invoked by user {ctx.author.id} in guild {guild_id}")
+        session_cog = self.bot.get_cog("SessionCog")
+        if session_cog is None:
+            await ctx.send("⚠️ SessionCog not found")
+            return
+
+        if idle_days == "run":
+            moved = await session_cog.apply_retention(guild_id)
+            await ctx.send(f"🗄 Archived `{moved}` sessions.")
+        elif idle_days is not None:
+            try:
+                days = float(idle_days)
+            except ValueError:
+                await ctx.send("Usage: `$retention <idle_days> [max_mb]` (0 turns a limit off) or `$retention run`")
+                return
+            policy = {"idle_days": max(days, 0)}
+            if max_mb is not None:
+                policy["max_mb"] = max(max_mb, 0)
+            set_guild_setting(guild_id, "session_retention", {**get_guild_setting(guild_id, "session_retention", {}), **policy})
+            await ctx.send("✅ Retention policy updated; it applies at the next sweep (`$retention run` to apply it now).")
+            return
+
+        days, max_bytes = session_cog.retention_policy(guild_id)
+        stats = await self.sessions.archive_stats(guild_id)
+        await ctx.send(
+            f"🗄 Retention: archive after `{days or 'never'}` idle days"
+            f"{f', or oldest first above `{max_bytes / 1024 / 1024:.0f}` MB' if max_bytes else ''}\n"
+            + (f"Archived: `{stats['sessions']}` sessions, `{stats['messages']}` messages, "
+               f"`{stats['raw_bytes'] / 1024:.0f}` KB → `{stats['stored_bytes'] / 1024:.0f}` KB\n" if stats else "")
+            + "Usage: `$retention <idle_days> [max_mb]` or `$retention run`"
+        )
+
+    @commands.command(name="responselimit")
+    @commands.check(is_owner)
+    async def response_limit(self, ctx, max_chars: int = None, command: str = "talk"):
+        """✂ Cap how many characters O-ni generates for a command in this server."""
+        guild_id = ctx.guild.id
+        logger.info(f"[USER] responselimit {max_chars} {command} invoked by user {ctx.author.id} in guild {guild_id}")
+        limits = dict(get_guild_setting(guild_id, "response_limits", {}))
+
+        if max_chars is None:
+            ai_cog = self.bot.get_cog("AICog")
+            current = ai_cog.response_limit(guild_id, command) if ai_cog else config["max_response_length"]
+            await ctx.send(f"✂ `{command}` replies are capped at `{current}` characters. Usage: `$responselimit <chars> [command]` (0 resets)")
+            return
+
+        if max_chars <= 0:
+            limits.pop(command, None)
+        else:
+            limits[command] = max_chars
+        set_guild_setting(guild_id, "response_limits", limits)
+        await ctx.send(f"✅ `{command}` reply cap for this server {'reset to default' if max_chars <= 0 else f'set to `{max_chars}` characters'}.")
+
     @commands.command(name="listdbsessions")
     @commands.has_permissions(administrator=True)
     async def list_db_sessions(self, ctx):
         """Admin command to list all sessions stored in the database."""
         logger.info(f"[COMMAND] listdbsessions invoked by {ctx.author} ({ctx.author.id})")
         await ctx.send("Command received, processing...", ephemeral=True)
-        if not os.path.exists(self.db_path):
-            await ctx.send("❌ No session database found.")
-            return
-
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT guild_id, user_id, session_name FROM sessions")
-            rows = cursor.fetchall()
-            conn.close()
+            rows = await self.sessions.list_all()
 
             logger.debug(f"[DB] Retrieved {len(rows)} rows from session DB")
 
@@ -165,50 +267,54 @@ class AdminCog(commands.Cog):
             await ctx.send("❓ Usage: `$export all`")
 
     async def export_all(self, ctx):
-        await ctx.send("⏳ Exporting all sessions, please wait...")
-
-        data = self.sessions.export_all_sessions()
-
-        # Create temp folder
-        temp_dir = tempfile.mkdtemp()
-        export_folder = os.path.join(temp_dir, "EXPORTFOLDER")
-        os.makedirs(export_folder, exist_ok=True)
-
-        for guild_id, users in data.items():
-            for user_id, sessions in users.items():
-                user_dir = os.path.join(export_folder, str(guild_id), str(user_id))
-                os.makedirs(user_dir, exist_ok=True)
-                for session_name, session_data in sessions.items():
-                    try:
-                        file_path = os.path.join(user_dir, f"{session_name}.json")
-                        with open(file_path, "w") as f:
-                            json.dump(session_data, f, indent=4)
-                    except Exception as e:
-                        print(f"⚠️ Failed to write session '{session_name}': {e}")
-
-        # Create zip
+        status = await ctx.send("⏳ Exporting all sessions, please wait...")
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        zip_filename = f"export_{timestamp}.zip"
-        zip_path = os.path.join(temp_dir, zip_filename)
-        shutil.make_archive(zip_path.replace(".zip", ""), 'zip', export_folder)
-
-        # Send result
+        temp_dir = tempfile.mkdtemp()
+        # Keep each part under what this server lets us upload
+        export = SessionExport(temp_dir, f"export_{timestamp}", ctx.guild.filesize_limit - EXPORT_SIZE_MARGIN)
+        task = asyncio.ensure_future(self.sessions.export_all_to(export))
+        sent = 0
+        try:
+            while True:
+                await asyncio.wait({task}, timeout=EXPORT_PROGRESS_INTERVAL)
+                finished = task.done()
+                for part in export.take_parts():
+                    sent += 1
+                    await self.send_export_part(ctx, part, sent)
+                    os.remove(part)
+                progress = export.progress()
+                await status.edit(content=(
+                    f"{'✅ Export complete' if finished else '⏳ Exporting'}: `{progress['sessions']}` sessions, "
+                    f"`{progress['messages']}` messages, `{progress['bytes'] / 1024 / 1024:.1f}` MB in `{progress['parts']}` part(s)"
+                ))
+                if finished:
+                    break
+            task.result()
+            if export.oversized:
+                await ctx.send(f"⚠️ {len(export.oversized)} session(s) are over the upload limit on their own: " + ", ".join(f"`{name}`" for name in export.oversized[:10]))
+            if export.skipped:
+                await ctx.send(f"⚠️ {len(export.skipped)} archived session(s) could not be read and are missing from the export: "
+                               + ", ".join(f"`{g}/{u}/{name}`" for g, u, name in export.skipped[:10]))
+        except Exception as e:
+            logger.error(f"[ERROR] Export failed: {e}", exc_info=True)
+            await ctx.send("❌ Export failed; check the logs.")
+        finally:
+            if not task.done():
+                # The worker thread cannot be interrupted; let it finish before removing its files
+                await asyncio.wait({task})
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    async def send_export_part(self, ctx, path, number: int):
         try:
-            await ctx.send(
-                "✅ Export complete.",
-                file=discord.File(zip_path, filename=zip_filename)
-            )
+            await ctx.send(f"📦 Export part {number}", file=discord.File(path, filename=os.path.basename(path)))
         except discord.HTTPException:
             try:
                 await ctx.author.send(
-                    "⚠️ File too large to send in the channel. Here's your export via DM:",
-                    file=discord.File(zip_path, filename=zip_filename)
+                    f"⚠️ Part {number} could not be sent in the channel. Here it is via DM:",
+                    file=discord.File(path, filename=os.path.basename(path))
                 )
             except discord.HTTPException:
-                await ctx.send("❌ Could not send file. It's likely too large for Discord.")
-
-        # Clean up
-        shutil.rmtree(temp_dir)
+                await ctx.send(f"❌ Could not send part {number}. It's likely too large for Discord.")
 
 
 
@@ -1,18 +1,24 @@
 # cogs/ai.py
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 import logging
-import asyncio
-import json
-import requests
-import os
 
-from core.session_manager import SessionManager
+from core.registry import get_services
 from core.llm_client import LLMClient
+from core.scheduler import InferenceScheduler, SchedulerFull
+from core.response_cache import ResponseCache
+from core.context_window import ContextWindow
+from core.summarizer import SessionSummarizer
+from core.memory import LongTermMemory
+from core.model_residency import ModelResidencyManager
+from core.model_catalog import ModelCatalog
+from core.generations import GenerationRegistry
 from utils.config_loader import load_config
 from utils.config_loader import get_allowed_channels
+from utils.stream_reply import StreamingReply
+from utils.guild_settings import get_guild_setting
 
 config = load_config()
 
@@ -50,33 +56,215 @@ class AICog(commands.Cog):
         self.bot = bot
         logger.debug("Initializing AICog...")
 
-        self.sessions = SessionManager(
-            db_path=os.path.join(config["bfl_root"], "sessions.db"),
-            max_sessions=config["max_sessions_per_user"]
+        self.sessions = get_services(bot).get("sessions")
+        self.llm = LLMClient(
+            default_model=config["default_model"],
+            pool_size=config.get("llm_pool_size", 8),
+            connect_timeout=config.get("llm_connect_timeout", 5),
+            read_timeout=config.get("llm_read_timeout", 120),
+            endpoints=config.get("ollama_endpoints"),
+            context_window=ContextWindow(
+                budgets=config.get("context_budgets", {"default": 4096}),
+                reserve_tokens=config.get("context_reserve_tokens", 512)
+            )
         )
-        self.llm = LLMClient(default_model=config["default_model"])
+        self.scheduler = InferenceScheduler(
+            model_limits=config.get("model_concurrency", {"default": 1}),
+            max_queue=config.get("scheduler_max_queue", 32)
+        )
+        self.cache = ResponseCache(
+            max_entries=config.get("response_cache_size", 256),
+            ttl=config.get("response_cache_ttl", 3600)
+        ) if config.get("response_cache_enabled", True) else None
+        residency = config.get("model_residency", {})
+        self.residency = ModelResidencyManager(
+            self.llm,
+            preload=residency.get("preload", [config["default_model"]]),
+            keep_alive=residency.get("keep_alive", {"default": "30m"}),
+            policy=residency.get("eviction_policy", "keep_alive"),
+            idle_minutes=residency.get("idle_minutes", 60)
+        )
+        self.summarizer = SessionSummarizer(
+            self.llm, self.sessions,
+            model=config.get("summary_model", config["default_model"]),
+            trigger_messages=config.get("summary_trigger_messages", 40),
+            keep_recent=config.get("summary_keep_recent", 12),
+            scheduler=self.scheduler,
+            residency=self.residency,
+            max_chars=config.get("command_response_limits", {}).get("summary", 1500)
+        )
+        # Long-term recall across sessions; needs an Ollama embedding model pulled
+        self.memory = LongTermMemory(
+            self.llm, config["bfl_root"],
+            model=config.get("memory_embed_model", "nomic-embed-text"),
+            top_k=config.get("memory_top_k", 4),
+            min_score=config.get("memory_min_score", 0.4),
+            max_loaded=config.get("memory_max_loaded", 64)
+        ) if config.get("memory_enabled", False) else None
+        self.memory_budget = config.get("memory_token_budget", 400)
         self.default_model = config["default_model"]
         self.system_prompt = config["default_system_prompt"]
-        self.available_models = self.fetch_models()
-
-        logger.debug(f"SessionManager initialized (root={config['bfl_root']})")
+        self.stream_responses = config.get("stream_responses", True)
+        self.stream_edit_interval = config.get("stream_edit_interval", 1.5)
+        self.max_response_length = config.get("max_response_length", 1999)
+        self.command_response_limits = config.get("command_response_limits", {})
+        self.generations = GenerationRegistry()
+        self.newest_prompt_wins = config.get("newest_prompt_wins", False)
+        # Filled in the background by catalog_refresh; cog loading never waits on Ollama
+        self.catalog = ModelCatalog(self.llm)
+        self.llm.context_window.catalog = self.catalog
+
+        logger.debug(f"Using shared session service (db={self.sessions.db_path})")
         logger.debug(f"LLMClient initialized (model={self.default_model})")
 
+    async def cog_load(self):
+        self.endpoint_health.change_interval(seconds=config.get("endpoint_check_interval", 30))
+        self.endpoint_health.start()
+        self.catalog_refresh.change_interval(minutes=config.get("model_catalog_refresh_minutes", 10))
+        self.catalog_refresh.start()
+        # Preload in the background so cog loading never waits on Ollama
+        self.residency_upkeep.start()
+
+    async def cog_unload(self):
+        await self.generations.cancel_all("cog unloading")
+        self.endpoint_health.cancel()
+        self.catalog_refresh.cancel()
+        self.residency_upkeep.cancel()
+        await self.residency.close()
+        await self.summarizer.close()
+        if self.memory is not None:
+            await self.memory.close()
+        await self.llm.close()
+        logger.debug("Closed LLMClient HTTP pool on unload.")
+
+    @tasks.loop(seconds=30)
+    async def endpoint_health(self):
+        try:
+            await self.llm.check_endpoints()
+        except Exception as e:
+            logger.error(f"Endpoint health check failed: {e}", exc_info=True)
+
+    @tasks.loop(minutes=10)
+    async def catalog_refresh(self):
+        try:
+            await self.catalog.refresh()
+        except Exception as e:
+            logger.error(f"Model catalog refresh failed: {e}", exc_info=True)
+
+    @tasks.loop(minutes=5)
+    async def residency_upkeep(self):
+        try:
+            if self.residency_upkeep.current_loop == 0:
+                await self.residency.preload_all()
+            else:
+                await self.residency.enforce_policy()
+        except Exception as e:
+            logger.error(f"Model residency upkeep failed: {e}", exc_info=True)
+
     def get_user_model(self, guild_id, user_id):
         # Placeholder for future customization
         logger.debug(f"Returning default model for guild {guild_id}, user {user_id}")
         return self.default_model
 
-    def fetch_models(self):
+    def response_limit(self, guild_id, command: str = "talk") -> int:
+        """Character cap for a reply: guild per-command override, then config per-command, then the global max."""
+        guild_limits = get_guild_setting(guild_id, "response_limits", {})
+        return guild_limits.get(command) or self.command_response_limits.get(command) or self.max_response_length
+
+    @property
+    def available_models(self) -> list[str]:
+        return self.catalog.names()
+
+    async def _store_turn(self, guild_id: str, user_id: str, session_name: str, history: list, prompt: str, response: str):
+        # Update session history
+        updated_history = history + [
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": response}
+        ]
+        await self.sessions.update(guild_id, user_id, session_name, updated_history)
+        logger.debug(f"[COMMAND] Session updated with new messages; total messages now {len(updated_history)}")
+        await self.summarizer.maybe_schedule(guild_id, user_id, session_name, updated_history)
+        if self.memory is not None:
+            self.memory.remember_in_background(guild_id, user_id, session_name, len(history), prompt, response)
+
+    async def _send_response(self, interaction: discord.Interaction, response: str):
+        # Send response in Discord message chunks of max 2000 characters
+        for i in range(0, len(response), 2000):
+            await interaction.followup.send(response[i:i + 2000])
+
+    async def _call_model(self, interaction: discord.Interaction, model: str, messages: list, guild_id: str, user_id: str, on_chunk):
+        """Waits for a scheduler slot, then runs the model call. Raises SchedulerFull if the queue rejected it."""
+        # Reserve a generation slot; busy models queue fairly across guilds and users
+        try:
+            ticket = self.scheduler.submit(model, guild_id, user_id)
+        except SchedulerFull as e:
+            await interaction.followup.send(f"🚦 O-ni is at capacity right now ({e.queued} requests waiting). Please try again in a moment.", ephemeral=True)
+            raise
+
+        queue_notice = None
+        try:
+            try:
+                if ticket.position:
+                    queue_notice = await interaction.followup.send(f"⏳ Queued, position {ticket.position}. I'll answer as soon as a slot frees up.", wait=True)
+            except BaseException:
+                # Stopped or failed before entering the ticket; an orphaned ticket would hold its slot forever
+                ticket.cancel()
+                raise
+
+            async with ticket:
+                await self._delete_notice(queue_notice)
+                queue_notice = None
+
+                self.residency.note_request(model)
+                keep_alive = self.residency.keep_alive_for(model)
+                # Call the LLM natively on the event loop over the pooled connection
+                return await self.llm.acall_model(
+                    model, messages, on_chunk=on_chunk, keep_alive=keep_alive,
+                    max_chars=self.response_limit(guild_id, "talk")
+                )
+        finally:
+            # Still set if we were stopped while waiting in the queue
+            await self._delete_notice(queue_notice)
+
+    async def _delete_notice(self, notice):
+        if notice is None:
+            return
+        try:
+            await notice.delete()
+        except discord.HTTPException:
+            pass
+
+    async def _generate(self, interaction: discord.Interaction, model: str, messages: list, guild_id: str, user_id: str, generation):
+        """
+        Runs one cancellable generation and delivers it. Returns None if the queue
+        rejected it, or if it was stopped and the partial output must not be kept.
+        """
+        # Post the first tokens right away and keep editing the reply as the model generates
+        reply = StreamingReply(interaction, edit_interval=self.stream_edit_interval) if self.stream_responses else None
+
+        async def on_chunk(chunk):
+            generation.parts.append(chunk)
+            if reply is not None:
+                await reply.feed(chunk)
+
         try:
-            response = requests.get("http://localhost:11434/api/tags")
-            response.raise_for_status()
-            models = [m["name"] for m in response.json().get("models", [])]
-            logger.info(f"Fetched {len(models)} models from Ollama.")
-            return models
-        except requests.RequestException as e:
-            logger.error(f"Failed to fetch models: {e}", exc_info=True)
-            return []
+            response = await generation.run(self._call_model(interaction, model, messages, guild_id, user_id, on_chunk))
+        except SchedulerFull:
+            return None
+
+        if generation.stopped:
+            response = generation.truncated_text()
+            logger.info(f"[COMMAND] Generation for user {user_id} in guild {guild_id} stopped ({generation.stop_reason}) after {len(generation.partial)} characters")
+        logger.debug(f"[COMMAND] Received response from model, length {len(response)} characters")
+
+        if reply is not None:
+            await reply.finish(response)
+        else:
+            await self._send_response(interaction, response)
+
+        if generation.stopped and not generation.keep_partial:
+            return None
+        return response
 
     @app_commands.command(name="talk", description="💬 Talk to the AI using your current session.")
     async def talk(self, interaction: discord.Interaction, prompt: str):
@@ -118,43 +306,56 @@ class AICog(commands.Cog):
             model = self.get_user_model(guild_id, user_id)
             logger.debug(f"[COMMAND] Using model '{model}' for user {user_id} in guild {guild_id}")
 
-            # Retrieve current chat history for this session
-            history = self.sessions.get_current_session(guild_id, user_id, session_name)
-            logger.debug(f"[COMMAND] Retrieved history with {len(history)} messages")
-
-            # Build full prompt for LLM
-            messages = self.llm.build_prompt(self.system_prompt, history, prompt)
-            logger.debug(f"[COMMAND] Built prompt with {len(messages)} messages (including system prompt and user input)")
-
-            # Call the LLM asynchronously in a thread to avoid blocking
-            response = await asyncio.to_thread(self.llm.call_model, model, messages)
-            logger.debug(f"[COMMAND] Received response from model, length {len(response)} characters")
-
-            # Update session history
-            updated_history = history + [
-                {"role": "user", "content": prompt},
-                {"role": "assistant", "content": response}
-            ]
-            self.sessions.update_session(guild_id, user_id, session_name, updated_history)
-            logger.debug(f"[COMMAND] Session updated with new messages; total messages now {len(updated_history)}")
-
-            # Save session to temp storage or DB
+            generation = self.generations.begin(
+                guild_id, user_id, session_name,
+                preempt=get_guild_setting(guild_id, "newest_prompt_wins", self.newest_prompt_wins)
+            )
             try:
-                self.sessions.filter_and_sync_sessions()
-                logger.debug("[COMMAND] Temporary sessions saved successfully.")
-            except Exception as e:
-                logger.error(f"[COMMAND] Failed to save temporary sessions: {e}", exc_info=True)
-
-            # Send response in Discord message chunks of max 2000 characters
-            # The first chunk must use followup.send (after defer), subsequent chunks also use followup.send
-            first_chunk = True
-            for i in range(0, len(response), 2000):
-                chunk = response[i:i + 2000]
-                if first_chunk:
-                    await interaction.followup.send(chunk)
-                    first_chunk = False
+                # A preempted reply stores its partial output first; read the session after it has
+                await generation.wait_for_preempted()
+
+                # Retrieve current chat history for this session
+                history = await self.sessions.get(guild_id, user_id, session_name)
+                logger.debug(f"[COMMAND] Retrieved history with {len(history)} messages")
+
+                # Older turns may already be folded into a pinned summary
+                summary, recent_history = await self.summarizer.prompt_view(guild_id, user_id, session_name, history)
+
+                # Related turns from any of the user's sessions; the ones still in the prompt are skipped
+                memories = None
+                if self.memory is not None:
+                    memories = await self.memory.recall(guild_id, user_id, prompt, session_name, skip_from=len(history) - len(recent_history))
+
+                # Build full prompt for LLM
+                messages = self.llm.build_prompt(self.system_prompt, recent_history, prompt, model=model, summary=summary,
+                                                 memories=memories, memory_budget=self.memory_budget)
+                logger.debug(f"[COMMAND] Built prompt with {len(messages)} messages (including system prompt and user input)")
+
+                # Identical prompts are answered from cache or share one in-flight generation
+                if self.cache is not None and get_guild_setting(guild_id, "response_cache", True):
+                    key = self.cache.make_key(model, messages)
+                    # A stopped reply is only partial; it is never cached or handed to coalesced requests
+                    response, fresh = await self.cache.run(key, lambda: self._generate(interaction, model, messages, guild_id, user_id, generation),
+                                                           shareable=lambda _: not generation.stopped)
+                    if not fresh and generation.stopped:
+                        # /stop arrived while we waited on the shared request; nothing to send or store
+                        logger.info(f"[COMMAND] Shared response for user {user_id} in guild {guild_id} dropped ({generation.stop_reason})")
+                        response = None
+                    elif response is None and not fresh:
+                        # The request we coalesced onto failed, was rejected or was stopped; try on our own
+                        response = await self._generate(interaction, model, messages, guild_id, user_id, generation)
+                    elif not fresh:
+                        logger.debug(f"[COMMAND] Serving shared response for user {user_id} in guild {guild_id}")
+                        await self._send_response(interaction, response)
                 else:
-                    await interaction.followup.send(chunk)
+                    response = await self._generate(interaction, model, messages, guild_id, user_id, generation)
+
+                if response is None:
+                    return
+
+                await self._store_turn(guild_id, user_id, session_name, history, prompt, response)
+            finally:
+                self.generations.finish(generation)
 
             logger.debug("[COMMAND] Response sent successfully")
 
@@ -171,6 +372,18 @@ class AICog(commands.Cog):
                 pass
 
 
+    @app_commands.command(name="stop", description="⏹ Stop O-ni's reply that is still being generated.")
+    async def stop(self, interaction: discord.Interaction):
+        guild_id = str(interaction.guild.id)
+        user_id = str(interaction.user.id)
+        logger.info(f"User {user_id} requested to stop generation in guild {guild_id}")
+
+        stopped = self.generations.cancel_user(guild_id, user_id, "stopped by user")
+        if stopped:
+            await interaction.response.send_message("⏹ Stopped. The partial reply was kept in your session.", ephemeral=True)
+        else:
+            await interaction.response.send_message("🤷 Nothing is being generated for you right now.", ephemeral=True)
+
     @app_commands.command(name="setmodel", description="🛠 Set your preferred model.")
     @app_commands.describe(model_name="The model you want to use.")
     async def setmodel(self, interaction: discord.Interaction, model_name: str):
@@ -178,18 +391,37 @@ class AICog(commands.Cog):
         user_id = str(interaction.user.id)
         logger.info(f"User {user_id} requested model change to {model_name}")
 
+        if not self.catalog.loaded:
+            await interaction.followup.send("⏳ The model list is still loading, try again in a few seconds.", ephemeral=True)
+            return
+
         if model_name not in self.available_models:
             await interaction.followup.send("❌ Model not available. Use `$modellist` to view options.", ephemeral=True)
             return
 
         self.default_model = model_name
+        # Start loading it now so the next /talk doesn't pay the cold start
+        if not self.residency.is_loaded(model_name):
+            self.residency.warm_in_background(model_name)
         await interaction.followup.send(f"✅ Model switched to `{model_name}`", ephemeral=True)
 
     @app_commands.command(name="modellist", description="📄 View available LLM models.")
     async def modellist(self, interaction: discord.Interaction):
         await interaction.response.defer(thinking=True)
         logger.info(f"User {interaction.user.id} requested model list.")
-        await interaction.followup.send("🧠 Available models:\n```\n" + "\n".join(self.available_models) + "\n```", ephemeral=True)
+        if not self.catalog.loaded:
+            await interaction.followup.send("⏳ The model list is still loading, try again in a few seconds.", ephemeral=True)
+            return
+
+        lines = []
+        for m in self.available_models:
+            details = self.catalog.describe(m)
+            lines.append(f"{'●' if self.residency.is_loaded(m) else '○'} {m}" + (f" ({details})" if details else ""))
+        await interaction.followup.send(
+            "🧠 Available models (● loaded, ○ cold):\n```\n" + "\n".join(lines) + "\n```"
+            f"Cold starts since boot: {self.residency.cold_starts}",
+            ephemeral=True
+        )
 
 
 async def setup(bot: commands.Bot):
@@ -1,7 +1,7 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from core.session_manager import SessionManager
+from core.registry import get_services
 import logging
 import json
 import tempfile
@@ -24,7 +24,7 @@ from typing import Optional
 class ExportCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.session_mgr = SessionManager("data/servers/sessions.db")
+        self.session_mgr = get_services(bot).get("sessions")
         self.db_path = self.session_mgr.db_path
 
     @app_commands.command(name="export", description="Export your session(s) by name or all")
@@ -36,7 +36,7 @@ class ExportCog(commands.Cog):
 
         if session_name:
             # Export one session
-            data = self.session_mgr.export_user_session(user_id, session_name)
+            data = await self.session_mgr.export_session(user_id, session_name)
             if not data:
                 await interaction.followup.send(f"❌ Session '{session_name}' not found.", ephemeral=True)
                 logger.error(f"[Export] Session '{session_name}' not found for user {user_id}")
@@ -59,8 +59,7 @@ class ExportCog(commands.Cog):
 
         else:
             # Export all sessions for user as zip
-            sessions = self.session_mgr.get_all_sessions_for_user(user_id)
-            # Expected: sessions is a dict: { session_name: data, ... }
+            sessions = await self.session_mgr.export_user(user_id)  # {session_name: messages}
             if not sessions:
                 await interaction.followup.send("❌ You have no sessions to export.", ephemeral=True)
                 logger.error(f"[Export] No sessions found for user {user_id}")
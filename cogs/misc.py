@@ -28,6 +28,7 @@ class Misc(commands.Cog):
         embed.add_field(name="‎", value="━━━━━━━━━━━━━━━━", inline=False)
         embed.add_field(name="**🤖 AI / LLM Commands**", value="\u200b", inline=False)
         embed.add_field(name="/talk", value="💬 Talk to the AI using your current session.", inline=False)
+        embed.add_field(name="/stop", value="⏹ Stop O-ni's reply that is still being generated.", inline=False)
         embed.add_field(name="/modellist", value="📄 View available LLM models.", inline=False)
         embed.add_field(name="/setmodel", value="🛠 Change your default LLM model.", inline=False)
 
@@ -40,6 +41,7 @@ class Misc(commands.Cog):
         embed.add_field(name="/savesession", value="💾 Save your current session.", inline=False)
         embed.add_field(name="/deletesession", value="🗑️ Delete a saved session.", inline=False)
         embed.add_field(name="/clearsession", value="🧹 Clear all messages in the current session.", inline=False)
+        embed.add_field(name="/searchsession", value="🔍 Search your saved sessions for a message.", inline=False)
         embed.add_field(name="/export", value="📦 Export your session to a file.", inline=False)
 
         # ─── Server & Misc ───
@@ -116,6 +118,7 @@ class Misc(commands.Cog):
         embed.add_field(name="‎", value="━━━━━━━━━━━━━━━━", inline=False)
         embed.add_field(name="**🤖 AI / LLM Commands**", value="\u200b", inline=False)
         embed.add_field(name="/talk", value="💬 Talk to the AI using your current session.", inline=False)
+        embed.add_field(name="/stop", value="⏹ Stop O-ni's reply that is still being generated.", inline=False)
         embed.add_field(name="/modellist", value="📄 View available LLM models.", inline=False)
         embed.add_field(name="/setmodel", value="🛠 Change your default LLM model.", inline=False)
 
@@ -128,6 +131,7 @@ class Misc(commands.Cog):
         embed.add_field(name="/savesession", value="💾 Save your current session.", inline=False)
         embed.add_field(name="/deletesession", value="🗑️ Delete a saved session.", inline=False)
         embed.add_field(name="/clearsession", value="🧹 Clear all messages in the current session.", inline=False)
+        embed.add_field(name="/searchsession", value="🔍 Search your saved sessions for a message.", inline=False)
 
         # ─── Server & Miscellaneous ───
         embed.add_field(name="‎", value="━━━━━━━━━━━━━━━━", inline=False)
@@ -2,8 +2,9 @@ import discord
 from discord.ext import commands, tasks
 from discord import app_commands
 from discord.ui import View, Select
-from core.session_manager import SessionManager
+from core.registry import get_services
 from utils.config_loader import load_config
+from utils.guild_settings import get_guild_setting
 import logging
 import os
 from pathlib import Path
@@ -23,7 +24,7 @@ if not logger.hasHandlers():
 
 
 class SessionSelect(Select):
-    def __init__(self, sessions: list[str], current_session: str):
+    def __init__(self, sessions: list[str], current_session: str, archived: list[str] = ()):
         options = [
             discord.SelectOption(
                 label=sess,
@@ -31,7 +32,12 @@ class SessionSelect(Select):
                 default=(sess == current_session)
             ) for sess in sessions
         ]
-        super().__init__(placeholder="Select a session to switch to", options=options, max_values=1)
+        options += [
+            discord.SelectOption(label=sess, description="Archived — restored on switch")
+            for sess in archived
+        ]
+        # Discord caps a select at 25 options; archived sessions are newest first, so the oldest drop off
+        super().__init__(placeholder="Select a session to switch to", options=options[:25], max_values=1)
 
     async def callback(self, interaction: discord.Interaction):
         selected = self.values[0]
@@ -39,8 +45,11 @@ class SessionSelect(Select):
         if cog:
             guild_id = interaction.guild.id
             user_id = interaction.user.id
+            await interaction.response.defer(ephemeral=True)
+            # Loading it brings an archived session back into the hot tables
+            await cog.sessions.get(guild_id, user_id, selected)
             cog.set_session_name(guild_id, user_id, selected)
-            await interaction.response.send_message(f"🧠 Switched to session `{selected}`", ephemeral=True)
+            await interaction.followup.send(f"🧠 Switched to session `{selected}`", ephemeral=True)
         else:
             await interaction.followup.send("⚠️ SessionCog not found", ephemeral=True)
 
@@ -51,29 +60,74 @@ class SessionCog(commands.Cog):
         bfl_root = Path(config["bfl_root"])
         temp_file = Path(config["temp_session_file"])
 
-        self.sessions = SessionManager(
-            db_path=os.path.join(config["bfl_root"], "sessions.db"),
-            max_sessions=config["max_sessions_per_user"]
-        )
+        self.sessions = get_services(bot).get("sessions")
 
-        logger.debug(f"[SessionCog] SessionManager initialized with data_root={bfl_root}")
+        logger.debug(f"[SessionCog] Using shared session service with data_root={bfl_root}")
         self.active_session = {}  # {guild_id: {user_id: session_name}}
-        self.sessions.filter_and_sync_sessions()
 
+    async def cog_load(self):
+        await self.sessions.sync()
+        self.retention_sweep.change_interval(minutes=config.get("session_archive_interval_minutes", 60))
+        self.retention_sweep.start()
+
+    async def cog_unload(self):
+        self.retention_sweep.cancel()
+
+    def retention_policy(self, guild_id) -> tuple[float, int]:
+        """(idle_days, max_bytes) for a guild: its own session_retention setting, else the config defaults. 0 = off."""
+        policy = get_guild_setting(guild_id, "session_retention", {})
+        idle_days = policy.get("idle_days", config.get("session_retention_idle_days", 0))
+        max_mb = policy.get("max_mb", config.get("session_retention_max_mb", 0))
+        return idle_days, int(max_mb * 1024 * 1024)
+
+    async def apply_retention(self, guild_id) -> int:
+        idle_days, max_bytes = self.retention_policy(guild_id)
+        if not idle_days and not max_bytes:
+            return 0
+        # Sessions with a reply still generating stay hot; anything else can go, cached or not
+        ai_cog = self.bot.get_cog("AICog")
+        busy = ai_cog.generations.active_keys if ai_cog is not None else None
+        moved = await self.sessions.apply_retention(guild_id, idle_days, max_bytes, busy=busy)
+        if moved:
+            logger.info(f"[AUTO] Archived {moved} sessions of guild {guild_id} (idle_days={idle_days}, max_bytes={max_bytes})")
+        return moved
+
+    @tasks.loop(minutes=60)
+    async def retention_sweep(self):
+        for guild in self.bot.guilds:
+            try:
+                await self.apply_retention(guild.id)
+            except Exception as e:
+                logger.exception(f"[ERROR] Retention sweep failed for guild {guild.id}: {e}")
+
+    @retention_sweep.before_loop
+    async def before_retention_sweep(self):
+        await self.bot.wait_until_ready()
 
-    def cog_unload(self):
-        self.sessions.filter_and_sync_sessions.cancel()
-        logger.debug("[SessionCog] Auto-save task canceled on unload.")
 
     @tasks.loop(minutes=30)
     async def auto_save_temp_sessions(self):
         try:
-            self.sessions.filter_and_sync_sessions()
+            await self.sessions.sync()
 
             logger.info("[AUTO] Temp sessions auto-saved successfully.")
         except Exception as e:
             logger.exception(f"[ERROR] Auto-save failed: {e}")
 
+    def stop_generations(self, guild_id, user_id, name: str, reason: str):
+        # A reply still generating into this session would write it back; drop it instead
+        ai_cog = self.bot.get_cog("AICog")
+        if ai_cog is not None:
+            ai_cog.generations.cancel_session(guild_id, user_id, name, reason, keep_partial=False)
+            # Likewise a compaction of the old history must not pin its summary on what comes next
+            ai_cog.summarizer.cancel(guild_id, user_id, name)
+
+    async def forget_memory(self, guild_id, user_id, name: str):
+        # Long-term memory must not bring back a session the user threw away
+        ai_cog = self.bot.get_cog("AICog")
+        if ai_cog is not None and ai_cog.memory is not None:
+            await ai_cog.memory.forget_session(guild_id, user_id, name)
+
     def get_session_name(self, guild_id: int, user_id: int) -> str:
         return self.active_session.get(str(guild_id), {}).get(str(user_id), "default")
 
@@ -86,7 +140,7 @@ class SessionCog(commands.Cog):
         await interaction.response.defer(thinking=True)
         guild_id = str(interaction.guild.id)
         user_id = str(interaction.user.id)
-        sessions = self.sessions.list_sessions(guild_id, user_id)
+        sessions = await self.sessions.list_sessions(guild_id, user_id)
 
         if sessions:
             await interaction.followup.send(f"📂 Your saved sessions:\n```\n" + "\n".join(sessions) + "\n```", ephemeral=False)
@@ -100,17 +154,16 @@ class SessionCog(commands.Cog):
         await interaction.response.defer(thinking=True)
 
         # Check if session already exists
-        if self.sessions.get_current_session(guild_id, user_id, name):
+        if await self.sessions.get(guild_id, user_id, name):
             await interaction.followup.send(f"⚠ A temp session named `{name}` already exists.", ephemeral=True)
             return
 
-        if name in self.sessions.list_sessions(guild_id, user_id):
+        if name in await self.sessions.list_sessions(guild_id, user_id):
             await interaction.followup.send(f"⚠ A saved session named `{name}` exists. Use `$switchsession {name}` to access it.", ephemeral=True)
             return
         try:
-            self.sessions.update_session(guild_id, user_id, name, [])
+            await self.sessions.update(guild_id, user_id, name, [])
             self.set_session_name(guild_id, user_id, name)
-            self.sessions.filter_and_sync_sessions()
 
 
             await interaction.followup.send(f"🆕 Created and switched to temp session `{name}`.\n💾 Saved to memory.")
@@ -124,7 +177,9 @@ class SessionCog(commands.Cog):
         user_id = str(interaction.user.id)
         await interaction.response.defer(thinking=True)
         try:
-            self.sessions.delete_session(guild_id, user_id, name)
+            self.stop_generations(guild_id, user_id, name, "session deleted")
+            await self.sessions.delete(guild_id, user_id, name)
+            await self.forget_memory(guild_id, user_id, name)
             await interaction.followup.send(f"❌ Session `{name}` deleted.", ephemeral=True)
         except Exception as e:
             logger.error(f"[ERROR] Could not delete session '{name}': {e}", exc_info=True)
@@ -137,9 +192,9 @@ class SessionCog(commands.Cog):
         user_id = str(interaction.user.id)
         try:
             name = self.get_session_name(guild_id, user_id)
-            self.sessions.update_session(guild_id, user_id, name, [])
-            self.sessions.filter_and_sync_sessions()
-
+            self.stop_generations(guild_id, user_id, name, "session cleared")
+            await self.sessions.update(guild_id, user_id, name, [])
+            await self.forget_memory(guild_id, user_id, name)
 
             await interaction.followup.send(f"🧹 Cleared all messages in session `{name}`.", ephemeral=True)
         except Exception as e:
@@ -163,20 +218,40 @@ class SessionCog(commands.Cog):
         await interaction.response.defer(thinking=True)
         guild_id = str(interaction.guild.id)
         user_id = str(interaction.user.id)
-        sessions = self.sessions.list_sessions(guild_id, user_id)
+        sessions = await self.sessions.list_sessions(guild_id, user_id)
+        archived = await self.sessions.list_archived(guild_id, user_id)
         try:
-            if not sessions:
+            if not sessions and not archived:
                 await interaction.followup.send("⚠️ You have no saved sessions to switch to.", ephemeral=True)
                 return
 
             current = self.get_session_name(guild_id, user_id)
             view = View(timeout=60)
-            view.add_item(SessionSelect(sessions, current))
+            view.add_item(SessionSelect(sessions, current, archived))
             await interaction.followup.send("Select a session to switch:", view=view, ephemeral=True)
         except Exception as e:
             logger.error(f"[ERROR] Error switching session: {e}", exc_info=True)
             await interaction.followup.send("⚠️ Failed to switch session.", ephemeral=True)
 
+    @app_commands.command(name="searchsession", description="🔍 Search your saved sessions for a message.")
+    async def searchsession(self, interaction: discord.Interaction, query: str):
+        await interaction.response.defer(thinking=True, ephemeral=True)
+        guild_id = str(interaction.guild.id)
+        user_id = str(interaction.user.id)
+        try:
+            results = await self.sessions.search(guild_id, user_id, query, limit=5)
+            if not results:
+                await interaction.followup.send(f"🔎 Nothing in your sessions matches `{query}`.", ephemeral=True)
+                return
+
+            lines = [f"🔍 Top matches for `{query}`:"]
+            for hit in results:
+                lines.append(f"**`{hit['session_name']}`** · message {hit['seq'] + 1} ({hit['role']})\n> {hit['snippet']}")
+            await interaction.followup.send("\n".join(lines)[:2000], ephemeral=True)
+        except Exception as e:
+            logger.error(f"[ERROR] Error searching sessions: {e}", exc_info=True)
+            await interaction.followup.send("⚠️ Failed to search sessions.", ephemeral=True)
+
 async def setup(bot):
     logger.debug("[DEBUG] Loading SessionCog...")
     await bot.add_cog(SessionCog(bot))
@@ -0,0 +1,88 @@
+#core/context_window.py
+import re
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+# Words and individual punctuation marks; close enough to BPE token counts for budgeting
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+# Chat templates add a few tokens of framing (role markers, separators) per message
+MESSAGE_OVERHEAD = 4
+
+
+class ContextWindow:
+    """
+    Keeps a prompt under a per-model token budget.
+
+    Token counts are estimated once per message content and cached, so the
+    history is not re-counted on every turn. When the history does not fit,
+    the oldest turns are dropped first; the system messages (prompt and any
+    pinned summary) and the latest user message are always kept.
+    """
+
+    def __init__(self, budgets: dict | None = None, reserve_tokens: int = 512, cache_size: int = 8192, catalog=None):
+        self.budgets = dict(budgets or {})
+        self.default_budget = self.budgets.pop("default", 4096)
+        self.reserve_tokens = reserve_tokens
+        self.cache_size = cache_size
+        self.catalog = catalog  # optional ModelCatalog, for models with a smaller native context
+        self._counts = OrderedDict()  # {content: token estimate}
+
+    def budget_for(self, model: str) -> int:
+        """Tokens available for the prompt, after reserving room for the reply."""
+        budget = self.budgets.get(model)
+        if budget is None:
+            budget = self.default_budget
+            context_length = self.catalog.context_length(model) if self.catalog is not None else None
+            if context_length:
+                budget = min(budget, context_length)
+        return max(0, budget - self.reserve_tokens)
+
+    def estimate(self, text: str) -> int:
+        count = self._counts.get(text)
+        if count is not None:
+            self._counts.move_to_end(text)
+            return count
+
+        words = _TOKEN_PATTERN.findall(text)
+        # Long words split into several tokens; roughly one extra token per 6 chars beyond the first 4
+        count = len(words) + sum((len(w) - 4) // 6 for w in words if len(w) > 4)
+        self._counts[text] = count
+        if len(self._counts) > self.cache_size:
+            self._counts.popitem(last=False)
+        return count
+
+    def message_tokens(self, message: dict) -> int:
+        return MESSAGE_OVERHEAD + self.estimate(message.get("content", ""))
+
+    def fit(self, model: str, system_messages: list[dict], history: list[dict], user_message: dict) -> list[dict]:
+        """Returns the system messages + the newest history that fits the budget + the user message."""
+        budget = self.budget_for(model) - self.message_tokens(user_message)
+        budget -= sum(self.message_tokens(m) for m in system_messages)
+
+        start = len(history)
+        used = 0
+        while start > 0:
+            cost = self.message_tokens(history[start - 1])
+            if used + cost > budget:
+                break
+            used += cost
+            start -= 1
+
+        # Never open the window on an assistant reply whose question was dropped
+        while start < len(history) and start > 0 and history[start].get("role") == "assistant":
+            used -= self.message_tokens(history[start])
+            start += 1
+
+        if start:
+            logger.debug(f"[CONTEXT] Dropped {start} of {len(history)} history messages to fit {self.budget_for(model)} tokens for '{model}' (history uses ~{used})")
+        return system_messages + history[start:] + [user_message]
@@ -0,0 +1,91 @@
+#core/db_pool.py
+import queue
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+# Applied to every connection. WAL lets readers run while the writer commits;
+# synchronous=NORMAL is durable across app crashes in WAL mode and far cheaper than FULL.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA cache_size = -16000;",  # ~16 MB page cache per connection
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA mmap_size = 268435456;",
+    "PRAGMA busy_timeout = 5000;",
+)
+
+
+class SQLitePool:
+    """
+    Long-lived SQLite connections for one database file.
+
+    One writer connection, serialized by a lock, and a small pool of reader
+    connections. Connections are opened once and reused, so sqlite3's
+    per-connection statement cache keeps every query we run prepared.
+    """
+
+    def __init__(self, db_path, readers: int = 4, statement_cache: int = 128):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.statement_cache = statement_cache
+        self._write_lock = threading.RLock()
+        self._writer = self._connect()
+        # WAL is a property of the file, so setting it once on the writer is enough
+        mode = self._writer.execute("PRAGMA journal_mode = WAL;").fetchone()[0]
+        self._readers = queue.LifoQueue()
+        for _ in range(readers):
+            self._readers.put(self._connect())
+        self._closed = False
+        logger.debug(f"[DB] Opened {self.db_path} (journal_mode={mode}, readers={readers})")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=self.statement_cache)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Exclusive access to the writer connection; commits on success, rolls back on error."""
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    @contextmanager
+    def reader(self):
+        """Borrows a reader connection; sees the last committed state without blocking the writer."""
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._write_lock:
+            try:
+                self._writer.execute("PRAGMA optimize;")
+            except sqlite3.Error:
+                pass
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        logger.debug(f"[DB] Closed {self.db_path}")
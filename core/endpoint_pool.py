@@ -0,0 +1,104 @@
+#core/endpoint_pool.py
+import time
+import asyncio
+import logging
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+
+class NoHealthyEndpoint(Exception):
+    """Raised when no Ollama node can take a request."""
+
+
+class OllamaEndpoint:
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.healthy = True
+        self.in_flight = 0
+        self.models = None  # set of model names once the first inventory check ran
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def __repr__(self):
+        return f"<OllamaEndpoint {self.base_url} healthy={self.healthy} in_flight={self.in_flight}>"
+
+
+class EndpointPool:
+    """
+    A set of Ollama nodes.
+
+    Requests go to the least-loaded healthy node that has the model. Periodic
+    checks refresh each node's model inventory; a failing node leaves the
+    rotation and is retried with exponential backoff.
+    """
+
+    def __init__(self, base_urls: list[str], base_backoff: float = 5, max_backoff: float = 300, check_timeout: float = 5):
+        self.endpoints = [OllamaEndpoint(url) for url in base_urls]
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.check_timeout = check_timeout
+
+    def healthy(self) -> list[OllamaEndpoint]:
+        return [ep for ep in self.endpoints if ep.healthy]
+
+    def inventory(self) -> set[str]:
+        """Every model available on at least one healthy node."""
+        return set().union(*(ep.models or set() for ep in self.healthy()))
+
+    def pick(self, model: str | None = None, exclude=()) -> OllamaEndpoint:
+        candidates = [ep for ep in self.healthy() if ep not in exclude]
+        if not candidates:
+            # Half-open: let a failed node take a request once its backoff has passed
+            now = time.monotonic()
+            candidates = [ep for ep in self.endpoints if ep not in exclude and ep.retry_at <= now]
+        if not candidates:
+            raise NoHealthyEndpoint("No Ollama server is reachable right now.")
+
+        if model is not None:
+            # Nodes whose inventory is still unknown stay eligible
+            with_model = [ep for ep in candidates if ep.models is None or model in ep.models]
+            candidates = with_model or candidates
+        return min(candidates, key=lambda ep: ep.in_flight)
+
+    def mark_success(self, ep: OllamaEndpoint):
+        if not ep.healthy or ep.failures:
+            logger.info(f"[POOL] {ep.base_url} is back in rotation")
+        ep.healthy = True
+        ep.failures = 0
+        ep.retry_at = 0.0
+
+    def mark_failure(self, ep: OllamaEndpoint, error=None):
+        ep.failures += 1
+        ep.healthy = False
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (ep.failures - 1))
+        ep.retry_at = time.monotonic() + backoff
+        logger.warning(f"[POOL] {ep.base_url} failed ({error}); out of rotation, retry in {backoff:.0f}s")
+
+    async def check(self, session: aiohttp.ClientSession):
+        """Health + inventory check of every node that is healthy or due for a retry."""
+        now = time.monotonic()
+        due = [ep for ep in self.endpoints if ep.healthy or ep.retry_at <= now]
+        await asyncio.gather(*(self._check_one(session, ep) for ep in due))
+
+    async def _check_one(self, session: aiohttp.ClientSession, ep: OllamaEndpoint):
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.check_timeout)
+            async with session.get(ep.base_url + "/api/tags", timeout=timeout) as res:
+                res.raise_for_status()
+                data = await res.json()
+        except Exception as e:
+            self.mark_failure(ep, e)
+            return
+        ep.models = {m["name"] for m in data.get("models", [])}
+        self.mark_success(ep)
+        logger.debug(f"[POOL] {ep.base_url} healthy with {len(ep.models)} models")
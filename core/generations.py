@@ -0,0 +1,128 @@
+#core/generations.py
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+TRUNCATION_MARKER = " […response stopped]"
+
+
+class Generation:
+    """One in-flight model call for a session, with whatever it has produced so far."""
+
+    def __init__(self, key: tuple):
+        self.key = key  # (guild_id, user_id, session_name)
+        self.parts = []
+        self.task = None
+        self.stop_reason = None
+        self.keep_partial = True
+        self.finished = asyncio.Event()
+        self.preempted = []  # older generations this one stopped; see wait_for_preempted()
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop_reason is not None
+
+    @property
+    def partial(self) -> str:
+        return "".join(self.parts)
+
+    def truncated_text(self) -> str:
+        return self.partial.rstrip() + TRUNCATION_MARKER
+
+    def cancel(self, reason: str, keep_partial: bool = True):
+        if self.stopped or self.finished.is_set():
+            return
+        self.stop_reason = reason
+        self.keep_partial = keep_partial
+        if self.task is not None and not self.task.done():
+            # Cancelling the task unwinds the aiohttp response, which closes the Ollama stream
+            self.task.cancel()
+        logger.info(f"[GEN] Stopping generation for {self.key} ({reason})")
+
+    async def wait_for_preempted(self, timeout: float = 10):
+        """
+        Waits (bounded) until the generations this one preempted have stored
+        their partial output, so the session read afterwards includes it.
+        """
+        pending = [older.finished.wait() for older in self.preempted if not older.finished.is_set()]
+        if pending:
+            try:
+                await asyncio.wait_for(asyncio.gather(*pending), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"[GEN] Preempted generation for {self.key} did not finish within {timeout}s")
+
+    async def run(self, coro):
+        """Runs the model call as a cancellable task. Returns None if it was stopped via cancel()."""
+        if self.stopped:
+            coro.close()  # stopped before the model call even started
+            return None
+        self.task = asyncio.ensure_future(coro)
+        try:
+            return await self.task
+        except asyncio.CancelledError:
+            if not self.stopped:
+                raise  # we were cancelled from outside, not stopped
+            return None
+
+
+class GenerationRegistry:
+    """Tracks in-flight generations so they can be stopped, preempted or drained on shutdown."""
+
+    def __init__(self):
+        self._active = {}  # {(guild_id, user_id, session_name): [Generation]}
+
+    def begin(self, guild_id, user_id, session_name: str, preempt: bool = False) -> Generation:
+        key = (str(guild_id), str(user_id), session_name)
+        generation = Generation(key)
+        if preempt:
+            for older in self._active.get(key, []):
+                older.cancel("preempted by a newer prompt")
+                generation.preempted.append(older)
+        self._active.setdefault(key, []).append(generation)
+        return generation
+
+    def active_keys(self) -> set[tuple]:
+        """(guild_id, user_id, session_name) of every session with a generation in flight."""
+        return set(self._active)
+
+    def finish(self, generation: Generation):
+        running = self._active.get(generation.key, [])
+        if generation in running:
+            running.remove(generation)
+        if not running:
+            self._active.pop(generation.key, None)
+        generation.finished.set()
+
+    def cancel_session(self, guild_id, user_id, session_name: str, reason: str, keep_partial: bool = True) -> int:
+        key = (str(guild_id), str(user_id), session_name)
+        running = list(self._active.get(key, []))
+        for generation in running:
+            generation.cancel(reason, keep_partial)
+        return len(running)
+
+    def cancel_user(self, guild_id, user_id, reason: str) -> int:
+        count = 0
+        for (g, u, session_name) in list(self._active):
+            if g == str(guild_id) and u == str(user_id):
+                count += self.cancel_session(g, u, session_name, reason)
+        return count
+
+    async def cancel_all(self, reason: str, timeout: float = 10):
+        """Stops everything and waits (bounded) for handlers to store their partial output."""
+        running = [g for gens in self._active.values() for g in gens]
+        for generation in running:
+            generation.cancel(reason)
+        if running:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(g.finished.wait() for g in running)), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"[GEN] {sum(not g.finished.is_set() for g in running)} generation(s) did not finish within {timeout}s")
@@ -1,8 +1,13 @@
 #core/llm_client.py
 import requests
+import aiohttp
+import asyncio
 import json
+import math
 import logging
 
+from core.endpoint_pool import EndpointPool, NoHealthyEndpoint
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
@@ -14,11 +19,41 @@ if not logger.hasHandlers():
     logger.addHandler(ch)
 
 class LLMClient:
-    def __init__(self, api_url="http://localhost:11434/api/chat", default_model="llama2:13b", stream=True):
+    def __init__(self, api_url="http://localhost:11434/api/chat", default_model="llama2:13b", stream=True,
+                 pool_size=8, connect_timeout=5, read_timeout=120, keepalive_timeout=60, context_window=None,
+                 endpoints=None):
         self.api_url = api_url
+        # Every request is routed through the pool; a single api_url is just a pool of one
+        self.pool = EndpointPool(endpoints or [api_url.split("/api/")[0]])
         self.default_model = default_model
         self.stream = stream
-        logger.debug(f"[DEBUG] LLMClient initialized with api_url={api_url}, default_model={default_model}, stream={stream}")
+        self.context_window = context_window  # optional ContextWindow used by build_prompt
+        self.chars_per_token = {}  # {model: running average}, learned from Ollama's eval_count
+
+        # Async mode: one pooled aiohttp session shared by every request on the event loop
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self._session: aiohttp.ClientSession | None = None
+
+        logger.debug(f"[DEBUG] LLMClient initialized with endpoints={[ep.base_url for ep in self.pool.endpoints]}, default_model={default_model}, stream={stream}, pool_size={pool_size}")
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Returns the shared keep-alive session, creating it lazily on the running loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive_timeout)
+            timeout = aiohttp.ClientTimeout(total=None, connect=self.connect_timeout, sock_read=self.read_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            logger.debug(f"[DEBUG] Opened pooled HTTP session (limit={self.pool_size}, keepalive={self.keepalive_timeout}s)")
+        return self._session
+
+    async def close(self):
+        """Closes the pooled HTTP session. Safe to call more than once."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.debug("[DEBUG] Closed pooled HTTP session.")
+        self._session = None
 
     def call_model(self, model_name, messages):
         """Sends a prompt and message history to the Ollama server."""
@@ -27,7 +62,7 @@ class LLMClient:
 
         try:
             res = requests.post(
-                self.api_url,
+                self.pool.pick(model_name).base_url + "/api/chat",
                 json={"model": model_name, "messages": messages, "stream": self.stream},
                 timeout=60,
                 stream=self.stream
@@ -49,6 +84,9 @@ class LLMClient:
                             break
                     except json.JSONDecodeError:
                         logger.warning("[WARN] Could not parse line from Ollama.")
+        except NoHealthyEndpoint as e:
+            logger.error(f"[ERROR] {e}")
+            return f"[O-ni] {e}"
         except requests.Timeout:
             logger.error("[ERROR] Timeout occurred from the model.")
             return "[O-ni] Timeout occurred from the model."
@@ -63,8 +101,157 @@ class LLMClient:
         logger.info(f"[AI] Model response length: {len(result)}")
         return result
 
-    def build_prompt(self, system_prompt, history, user_input):
-        """Builds a complete chat prompt for a user."""
+    async def check_endpoints(self):
+        """Runs one health + model inventory check across the endpoint pool."""
+        await self.pool.check(self._get_session())
+
+    async def get_json(self, path, endpoint=None):
+        """GETs an Ollama API path (e.g. /api/ps) over the pooled session."""
+        endpoint = endpoint or self.pool.pick()
+        async with self._get_session().get(endpoint.base_url + path) as res:
+            res.raise_for_status()
+            return await res.json()
+
+    async def post_json(self, path, payload, endpoint=None):
+        """POSTs a non-streaming request to an Ollama API path, routed by the payload's model."""
+        endpoint = endpoint or self.pool.pick(payload.get("model"))
+        async with self._get_session().post(endpoint.base_url + path, json={**payload, "stream": False}) as res:
+            res.raise_for_status()
+            return await res.json()
+
+    def num_predict_for(self, model_name, max_chars):
+        """Token cap for a character budget, using what this model has averaged so far."""
+        ratio = self.chars_per_token.get(model_name, 4.0)
+        # A little headroom so the character budget, not the token cap, usually ends the reply
+        return math.ceil(max_chars / ratio * 1.1) + 8
+
+    def _learn_ratio(self, model_name, chars, eval_count):
+        if not eval_count or chars < 200:
+            return
+        observed = chars / eval_count
+        previous = self.chars_per_token.get(model_name)
+        self.chars_per_token[model_name] = observed if previous is None else previous * 0.8 + observed * 0.2
+
+    async def stream_model(self, model_name, messages, keep_alive=None, max_chars=None):
+        """
+        Streams content chunks from Ollama's NDJSON /api/chat response as they arrive.
+        If a node fails before sending anything, the request moves to the next one.
+        With max_chars, Ollama gets a matching num_predict and the stream is cut
+        as soon as the character budget is reached.
+        """
+        logger.info(f"[AI] Streaming from model: {model_name}")
+        session = self._get_session()
+        payload = {"model": model_name, "messages": messages, "stream": True}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        if max_chars is not None:
+            payload["options"] = {"num_predict": self.num_predict_for(model_name, max_chars)}
+
+        tried = []
+        while True:
+            endpoint = self.pool.pick(model_name, exclude=tried)
+            tried.append(endpoint)
+            endpoint.in_flight += 1
+            started = False
+            emitted = 0
+            try:
+                async with session.post(endpoint.base_url + "/api/chat", json=payload) as res:
+                    res.raise_for_status()
+                    logger.debug(f"[DEBUG] POST request to {endpoint.base_url} successful, processing stream...")
+
+                    async for line in res.content:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            obj = json.loads(line)
+                        except json.JSONDecodeError:
+                            logger.warning("[WARN] Could not parse line from Ollama.")
+                            continue
+
+                        content = obj.get("message", {}).get("content")
+                        if content:
+                            started = True
+                            if max_chars is not None and emitted + len(content) >= max_chars:
+                                # Budget reached: hand back what fits and hang up on the rest
+                                yield content[:max_chars - emitted]
+                                logger.debug(f"[DEBUG] Stopped '{model_name}' at the {max_chars}-char budget.")
+                                break
+                            emitted += len(content)
+                            yield content
+                        if obj.get("done", False):
+                            logger.debug("[DEBUG] Received done signal from Ollama stream.")
+                            self._learn_ratio(model_name, emitted, obj.get("eval_count"))
+                            break
+                self.pool.mark_success(endpoint)
+                return
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.pool.mark_failure(endpoint, e)
+                if started or len(tried) >= len(self.pool.endpoints):
+                    raise
+                logger.warning(f"[WARN] Retrying '{model_name}' on another endpoint")
+            finally:
+                endpoint.in_flight -= 1
+
+    async def acall_model(self, model_name, messages, on_chunk=None, keep_alive=None, max_chars=None):
+        """
+        Async counterpart of call_model(); runs on the event loop over the pooled session.
+        If `on_chunk` is given, it is awaited with every chunk as it arrives.
+        """
+        response_parts = []
+
+        try:
+            async for content in self.stream_model(model_name, messages, keep_alive=keep_alive, max_chars=max_chars):
+                response_parts.append(content)
+                if on_chunk is not None:
+                    await on_chunk(content)
+        except NoHealthyEndpoint as e:
+            logger.error(f"[ERROR] {e}")
+            return f"[O-ni] {e}"
+        except asyncio.TimeoutError:
+            logger.error("[ERROR] Timeout occurred from the model.")
+            return "[O-ni] Timeout occurred from the model."
+        except aiohttp.ClientError as e:
+            logger.error(f"[ERROR] Request error: {e}")
+            return f"[O-ni] Request error: {str(e)}"
+        except Exception as e:
+            logger.error(f"[ERROR] Unknown error: {e}", exc_info=True)
+            return f"[O-ni] Unknown error: {str(e)}"
+
+        result = "".join(response_parts).strip() or "[O-ni] No response returned."
+        logger.info(f"[AI] Model response length: {len(result)}")
+        return result
+
+    def build_prompt(self, system_prompt, history, user_input, model=None, summary=None, memories=None, memory_budget=400):
+        """
+        Builds a complete chat prompt for a user. A pinned summary of older turns
+        goes right after the system prompt, followed by any recalled turns from
+        other sessions (best first, up to `memory_budget` tokens). With a context
+        window and a model, the oldest history is trimmed to fit that model's
+        token budget.
+        """
         logger.debug("[DEBUG] Building prompt with system prompt, history length: %d, user input length: %d",
                      len(history), len(user_input))
-        return [{"role": "system", "content": system_prompt}] + history + [{"role": "user", "content": user_input}]
\ No newline at end of file
+        system_messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            system_messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        if memories:
+            recalled = self._fit_memories(memories, memory_budget)
+            if recalled:
+                system_messages.append({"role": "system", "content": "Related moments from your earlier conversations with this user (use them only if relevant):\n" + "\n".join(recalled)})
+        user_message = {"role": "user", "content": user_input}
+        if self.context_window is not None and model is not None:
+            return self.context_window.fit(model, system_messages, history, user_message)
+        return system_messages + history + [user_message]
+
+    def _fit_memories(self, memories, budget):
+        """Keeps recalled turns, in rank order, while they fit the token budget."""
+        estimate = self.context_window.estimate if self.context_window is not None else (lambda text: len(text) // 4)
+        fitted, used = [], 0
+        for memory in memories:
+            cost = estimate(memory)
+            if used + cost > budget:
+                break
+            fitted.append(f"- {memory}")
+            used += cost
+        return fitted
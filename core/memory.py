@@ -0,0 +1,300 @@
+#core/memory.py
+import os
+import json
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+# Stored turn text is clipped; recall only needs enough to jog the model's memory
+MAX_TURN_CHARS = 600
+
+
+class VectorIndex:
+    """
+    One user's memory in one guild, kept in two append-only files:
+
+        <user_id>.f32    row-major float32 matrix, one L2-normalized row per turn
+        <user_id>.jsonl  a header line {"model", "dim"}, then one {"s", "seq", "text"} line per row
+
+    Rows are appended vector first, so after a crash the matrix can only run
+    ahead of the metadata; loading trims it back. Not thread-safe on its own;
+    LongTermMemory serializes access with `lock`, and never evicts an index
+    while `users` > 0, so there is only ever one instance per pair of files.
+    """
+
+    def __init__(self, base: Path):
+        self.vec_path = base.with_suffix(".f32")
+        self.meta_path = base.with_suffix(".jsonl")
+        self.lock = threading.Lock()
+        self.users = 0  # callers between LongTermMemory._index() and _release()
+        self.model = None
+        self.dim = 0
+        self.rows = 0
+        self.entries = []  # [{"s": session_name, "seq": index of the user message, "text": turn}]
+        self.matrix = np.empty((0, 0), dtype=np.float32)  # capacity >= rows; grown by doubling
+        self.session_codes = np.empty(0, dtype=np.int32)
+        self.seqs = np.empty(0, dtype=np.int32)
+        self._codes = {}  # {session_name: code}
+        self._load()
+
+    def _load(self):
+        if not self.meta_path.exists():
+            return
+        lines = self.meta_path.read_text(encoding="utf-8").splitlines()
+        try:
+            header = json.loads(lines[0])
+            model, dim = header["model"], int(header["dim"])
+        except (IndexError, KeyError, TypeError, ValueError):
+            logger.warning(f"[MEMORY] Unreadable index {self.meta_path}; it is rebuilt on the next turn")
+            return
+        if not dim:
+            return
+        entries = []
+        for line in lines[1:]:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                break  # torn write; the rows from here on are trimmed below
+        self.model, self.dim = model, dim
+        vectors = np.fromfile(self.vec_path, dtype=np.float32) if self.vec_path.exists() else np.empty(0, dtype=np.float32)
+        rows = min(len(entries), vectors.size // self.dim)
+        if rows != len(entries) or vectors.size != rows * self.dim:
+            logger.warning(f"[MEMORY] Trimming {self.meta_path.name} to its {rows} complete rows")
+            entries = entries[:rows]
+            vectors = vectors[:rows * self.dim]
+            self._rewrite(vectors.reshape(rows, self.dim), entries)
+        self.entries = entries
+        self.rows = rows
+        self.matrix = vectors.reshape(rows, self.dim).copy()
+        self.session_codes = np.array([self._code(e["s"]) for e in entries], dtype=np.int32)
+        self.seqs = np.array([e["seq"] for e in entries], dtype=np.int32)
+
+    def _code(self, session_name: str) -> int:
+        return self._codes.setdefault(session_name, len(self._codes))
+
+    def _reset(self, model: str | None, dim: int):
+        self.model, self.dim, self.rows = model, dim, 0
+        self.entries = []
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+        self.session_codes = np.empty(0, dtype=np.int32)
+        self.seqs = np.empty(0, dtype=np.int32)
+        self._codes = {}
+        self._rewrite(self.matrix, [])
+
+    def _rewrite(self, matrix: np.ndarray, entries: list[dict]):
+        """Replaces both files atomically (used for trims, resets and forgetting)."""
+        self.meta_path.parent.mkdir(parents=True, exist_ok=True)
+        vec_tmp = self.vec_path.with_suffix(".f32.tmp")
+        meta_tmp = self.meta_path.with_suffix(".jsonl.tmp")
+        np.ascontiguousarray(matrix, dtype=np.float32).tofile(vec_tmp)
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"model": self.model, "dim": self.dim}) + "\n")
+            f.writelines(json.dumps(e) + "\n" for e in entries)
+        os.replace(vec_tmp, self.vec_path)
+        os.replace(meta_tmp, self.meta_path)
+
+    def _grow(self, needed: int):
+        capacity = len(self.matrix)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 64)
+        for name in ("matrix", "session_codes", "seqs"):
+            old = getattr(self, name)
+            grown = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:self.rows] = old[:self.rows]
+            setattr(self, name, grown)
+
+    def add(self, model: str, vector: np.ndarray, entry: dict):
+        if self.model != model or self.dim != vector.size:
+            if self.rows:
+                logger.info(f"[MEMORY] Embedding model changed ({self.model} -> {model}); rebuilding {self.meta_path.name}")
+            self._reset(model, vector.size)
+        self._grow(self.rows + 1)
+        self.matrix[self.rows] = vector
+        self.session_codes[self.rows] = self._code(entry["s"])
+        self.seqs[self.rows] = entry["seq"]
+        self.rows += 1
+        self.entries.append(entry)
+        with open(self.vec_path, "ab") as f:
+            f.write(vector.astype(np.float32).tobytes())
+        with open(self.meta_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def search(self, vector: np.ndarray, k: int, min_score: float, session_name: str | None = None, skip_from: int = 0) -> list[tuple[float, dict]]:
+        """Top-k rows by cosine similarity, skipping `session_name` turns from seq `skip_from` on."""
+        if not self.rows or vector.size != self.dim:
+            return []
+        scores = self.matrix[:self.rows] @ vector
+        if session_name in self._codes:
+            scores[(self.session_codes[:self.rows] == self._codes[session_name]) & (self.seqs[:self.rows] >= skip_from)] = -np.inf
+        k = min(k, self.rows)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.entries[i]) for i in top if scores[i] >= min_score]
+
+    def remove_session(self, session_name: str, from_seq: int = 0) -> int:
+        """Drops a session's turns from seq `from_seq` on; returns how many rows went."""
+        if session_name not in self._codes:
+            return 0
+        drop = (self.session_codes[:self.rows] == self._codes[session_name]) & (self.seqs[:self.rows] >= from_seq)
+        removed = int(drop.sum())
+        if removed:
+            keep = np.flatnonzero(~drop)
+            self.matrix = self.matrix[keep]
+            self.session_codes = self.session_codes[keep]
+            self.seqs = self.seqs[keep]
+            self.entries = [self.entries[i] for i in keep]
+            self.rows = len(keep)
+            self._rewrite(self.matrix, self.entries)
+        return removed
+
+
+class LongTermMemory:
+    """
+    Recall across every session a user has had in a guild.
+
+    Each finished turn is embedded through Ollama's /api/embed in the
+    background and appended to that user's VectorIndex under
+    `root/<guild_id>/memory/`. Before a reply, the prompt is embedded and the
+    closest earlier turns (not the ones already in the prompt) are handed to
+    build_prompt, which fits them into the memory token budget.
+    """
+
+    def __init__(self, llm, root, model: str = "nomic-embed-text", top_k: int = 4,
+                 min_score: float = 0.4, max_loaded: int = 64):
+        self.llm = llm
+        self.root = Path(root)
+        self.model = model
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_loaded = max_loaded
+        self._indexes = OrderedDict()  # {(guild_id, user_id): VectorIndex}, LRU
+        self._lock = threading.Lock()
+        self._pending = set()  # background remember() tasks
+
+    def _base_path(self, guild_id, user_id) -> Path:
+        return self.root / str(guild_id) / "memory" / str(user_id)
+
+    def _index(self, guild_id, user_id, create: bool) -> VectorIndex | None:
+        """The user's index, pinned in the LRU until it is handed to _release()."""
+        key = (str(guild_id), str(user_id))
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                index.users += 1
+                return index
+        base = self._base_path(guild_id, user_id)
+        if not create and not base.with_suffix(".jsonl").exists():
+            return None
+        index = VectorIndex(base)
+        with self._lock:
+            index = self._indexes.setdefault(key, index)
+            self._indexes.move_to_end(key)
+            index.users += 1
+            self._evict()
+        return index
+
+    def _release(self, index: VectorIndex):
+        with self._lock:
+            index.users -= 1
+            self._evict()
+
+    def _evict(self):
+        # Least recently used first, skipping pinned indexes: a second instance over the same files would diverge
+        overflow = len(self._indexes) - self.max_loaded
+        if overflow <= 0:
+            return
+        idle = [key for key, index in self._indexes.items() if not index.users][:overflow]
+        for key in idle:
+            del self._indexes[key]  # everything is already on disk
+
+    async def _embed(self, text: str) -> np.ndarray:
+        result = await self.llm.post_json("/api/embed", {"model": self.model, "input": [text]})
+        vector = np.asarray(result["embeddings"][0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def recall(self, guild_id, user_id, query: str, session_name: str | None = None, skip_from: int = 0) -> list[str]:
+        """Earlier turns most related to `query`, best first. Never raises; memory is best-effort."""
+        try:
+            index = await asyncio.to_thread(self._index, guild_id, user_id, False)
+            if index is None:
+                return []
+            try:
+                if not index.rows:
+                    return []  # nothing to search, so skip the embedding call
+                vector = await self._embed(query)
+
+                def search():
+                    with index.lock:
+                        if index.model != self.model:
+                            return []
+                        return index.search(vector, self.top_k, self.min_score, session_name, skip_from)
+
+                hits = await asyncio.to_thread(search)
+            finally:
+                self._release(index)
+        except Exception as e:
+            logger.warning(f"[MEMORY] Recall failed for user {user_id} in guild {guild_id}: {e}")
+            return []
+        if hits:
+            logger.debug(f"[MEMORY] Recalled {len(hits)} turns for user {user_id} (best score {hits[0][0]:.2f})")
+        return [f"(session `{entry['s']}`) {entry['text']}" for _, entry in hits]
+
+    def remember_in_background(self, guild_id, user_id, session_name: str, seq: int, prompt: str, response: str):
+        task = asyncio.create_task(self.remember(guild_id, user_id, session_name, seq, prompt, response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def remember(self, guild_id, user_id, session_name: str, seq: int, prompt: str, response: str):
+        text = f"User: {prompt}\nO-ni: {response}"[:MAX_TURN_CHARS]
+        try:
+            vector = await self._embed(text)
+
+            def add():
+                index = self._index(guild_id, user_id, True)
+                try:
+                    with index.lock:
+                        index.add(self.model, vector, {"s": session_name, "seq": seq, "text": text})
+                finally:
+                    self._release(index)
+
+            await asyncio.to_thread(add)
+        except Exception as e:
+            logger.warning(f"[MEMORY] Could not remember a turn of '{session_name}' for user {user_id}: {e}")
+
+    async def forget_session(self, guild_id, user_id, session_name: str, from_seq: int = 0):
+        """Drops a deleted or cleared session from memory so it is never recalled again."""
+        def remove():
+            index = self._index(guild_id, user_id, False)
+            if index is None:
+                return 0
+            try:
+                with index.lock:
+                    return index.remove_session(session_name, from_seq)
+            finally:
+                self._release(index)
+
+        removed = await asyncio.to_thread(remove)
+        if removed:
+            logger.info(f"[MEMORY] Forgot {removed} turns of '{session_name}' for user {user_id} in guild {guild_id}")
+
+    async def close(self):
+        # Let in-flight turns land on disk; they are already off the reply path
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        self._pending.clear()
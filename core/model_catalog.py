@@ -0,0 +1,99 @@
+#core/model_catalog.py
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+
+class ModelCatalog:
+    """
+    In-memory catalog of the models the Ollama pool can serve.
+
+    Refreshed asynchronously (never on a command's hot path), so /setmodel,
+    /modellist and routing code read names and metadata without touching the
+    network. Each entry is a dict with name, parameter_size, quantization,
+    family, size, context_length and the endpoints that hold it.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+        self.models = {}  # {name: metadata dict}
+        self.refreshed_at = None
+        self._show_cache = {}  # {digest: context_length}, /api/show is only asked once per model build
+
+    @property
+    def loaded(self) -> bool:
+        return self.refreshed_at is not None
+
+    def names(self) -> list[str]:
+        return sorted(self.models)
+
+    def get(self, name: str) -> dict | None:
+        return self.models.get(name)
+
+    def context_length(self, name: str) -> int | None:
+        info = self.models.get(name)
+        return info["context_length"] if info else None
+
+    async def refresh(self):
+        models = {}
+        for endpoint in self.llm.pool.healthy():
+            try:
+                data = await self.llm.get_json("/api/tags", endpoint=endpoint)
+            except Exception as e:
+                logger.warning(f"[CATALOG] Could not list models on {endpoint.base_url}: {e}")
+                continue
+
+            for m in data.get("models", []):
+                details = m.get("details", {})
+                info = models.setdefault(m["name"], {
+                    "name": m["name"],
+                    "parameter_size": details.get("parameter_size"),
+                    "quantization": details.get("quantization_level"),
+                    "family": details.get("family"),
+                    "size": m.get("size"),
+                    "digest": m.get("digest"),
+                    "context_length": None,
+                    "endpoints": [],
+                })
+                info["endpoints"].append(endpoint.base_url)
+
+        for info in models.values():
+            info["context_length"] = await self._context_length(info)
+
+        if not models and self.models:
+            # Keep serving the last good catalog while every node is unreachable
+            logger.warning("[CATALOG] No models returned; keeping the previous catalog")
+            return
+        self.models = models
+        self.refreshed_at = time.time()
+        logger.info(f"[CATALOG] Refreshed model catalog: {len(models)} models")
+
+    async def _context_length(self, info: dict) -> int | None:
+        key = info["digest"] or info["name"]
+        if key in self._show_cache:
+            return self._show_cache[key]
+        try:
+            data = await self.llm.post_json("/api/show", {"model": info["name"]})
+        except Exception as e:
+            logger.debug(f"[CATALOG] /api/show failed for '{info['name']}': {e}")
+            return None
+        # model_info keys are namespaced by architecture, e.g. "llama.context_length"
+        context_length = next((v for k, v in data.get("model_info", {}).items() if k.endswith(".context_length")), None)
+        self._show_cache[key] = context_length
+        return context_length
+
+    def describe(self, name: str) -> str:
+        info = self.models.get(name, {})
+        parts = [info.get("parameter_size"), info.get("quantization")]
+        if info.get("context_length"):
+            parts.append(f"ctx {info['context_length']}")
+        return ", ".join(p for p in parts if p)
@@ -0,0 +1,127 @@
+#core/model_residency.py
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+# Eviction policies an operator can pick in config.json
+POLICY_KEEP_ALIVE = "keep_alive"  # let Ollama unload models when their keep_alive runs out
+POLICY_IDLE = "idle"              # unload non-preloaded models once idle for idle_minutes
+POLICY_NEVER = "never"            # keep every model loaded until the bot says otherwise
+
+
+class ModelResidencyManager:
+    """
+    Tracks which models Ollama has in memory and keeps the ones we need warm.
+
+    Preloads the configured models at startup, warms a model in the background
+    when it is selected, sends a per-model keep_alive with every request and
+    only evicts according to the configured policy.
+    """
+
+    def __init__(self, llm, preload: list[str] | None = None, keep_alive: dict | None = None,
+                 policy: str = POLICY_KEEP_ALIVE, idle_minutes: float = 60):
+        self.llm = llm
+        self.preload = list(preload or [])
+        self.keep_alive = dict(keep_alive or {})
+        self.default_keep_alive = self.keep_alive.pop("default", "30m")
+        self.policy = policy
+        self.idle_minutes = idle_minutes
+        self.loaded = {}     # {model: expires_at string from /api/ps}
+        self.last_used = {}  # {model: monotonic time of the last request}
+        self.cold_starts = 0
+        self._warming = {}   # {model: Task}
+
+    def keep_alive_for(self, model: str):
+        # Under "idle" and "never" the bot decides when to unload, so Ollama must not time models out
+        if self.policy in (POLICY_IDLE, POLICY_NEVER):
+            return -1
+        return self.keep_alive.get(model, self.default_keep_alive)
+
+    def is_loaded(self, model: str) -> bool:
+        return model in self.loaded
+
+    def note_request(self, model: str):
+        """Call right before a generation; records use and makes cold starts visible."""
+        if not self.is_loaded(model):
+            self.cold_starts += 1
+            logger.warning(f"[RESIDENCY] Cold start: '{model}' is not loaded, this request pays the load time")
+        self.last_used[model] = time.monotonic()
+        self.loaded.setdefault(model, None)
+
+    async def refresh(self):
+        """Re-reads the set of resident models from /api/ps on every healthy node."""
+        loaded = {}
+        for endpoint in self.llm.pool.healthy():
+            try:
+                data = await self.llm.get_json("/api/ps", endpoint=endpoint)
+            except Exception as e:
+                logger.warning(f"[RESIDENCY] Could not read loaded models from {endpoint.base_url}: {e}")
+                continue
+            for m in data.get("models", []):
+                loaded[m["name"]] = m.get("expires_at")
+        self.loaded = loaded
+        logger.debug(f"[RESIDENCY] Loaded models: {list(self.loaded)}")
+
+    async def warm(self, model: str) -> bool:
+        """Loads a model into memory with its keep_alive. An empty generate request only loads."""
+        started = time.monotonic()
+        try:
+            await self.llm.post_json("/api/generate", {"model": model, "keep_alive": self.keep_alive_for(model)})
+        except Exception as e:
+            logger.error(f"[RESIDENCY] Failed to warm '{model}': {e}")
+            return False
+        self.loaded.setdefault(model, None)
+        self.last_used.setdefault(model, time.monotonic())
+        logger.info(f"[RESIDENCY] Warmed '{model}' in {time.monotonic() - started:.1f}s")
+        return True
+
+    def warm_in_background(self, model: str):
+        task = self._warming.get(model)
+        if task is not None and not task.done():
+            return
+        self._warming[model] = asyncio.create_task(self.warm(model))
+        self._warming[model].add_done_callback(lambda _: self._warming.pop(model, None))
+
+    async def preload_all(self):
+        await self.refresh()
+        for model in self.preload:
+            if not self.is_loaded(model):
+                await self.warm(model)
+
+    async def evict(self, model: str):
+        try:
+            await self.llm.post_json("/api/generate", {"model": model, "keep_alive": 0})
+        except Exception as e:
+            logger.error(f"[RESIDENCY] Failed to evict '{model}': {e}")
+            return
+        self.loaded.pop(model, None)
+        logger.info(f"[RESIDENCY] Evicted '{model}'")
+
+    async def enforce_policy(self):
+        """Periodic upkeep: resync with Ollama and apply the eviction policy."""
+        await self.refresh()
+        if self.policy == POLICY_NEVER:
+            # Models that fell out anyway (e.g. Ollama restarted) come back
+            for model in self.preload:
+                if not self.is_loaded(model):
+                    await self.warm(model)
+        elif self.policy == POLICY_IDLE:
+            cutoff = time.monotonic() - self.idle_minutes * 60
+            for model in list(self.loaded):
+                if model not in self.preload and self.last_used.get(model, 0) < cutoff:
+                    await self.evict(model)
+
+    async def close(self):
+        for task in list(self._warming.values()):
+            task.cancel()
+        self._warming.clear()
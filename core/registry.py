@@ -0,0 +1,63 @@
+#core/registry.py
+import inspect
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+
+class ServiceRegistry:
+    """
+    Long-lived services shared by every cog (e.g. "sessions").
+
+    The registry hangs off the bot rather than any cog, so services keep their
+    state across `reloadcogs` and every cog sees the same instance.
+    """
+
+    def __init__(self):
+        self._services = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._services
+
+    def register(self, name: str, service):
+        if name in self._services:
+            raise ValueError(f"Service '{name}' is already registered")
+        self._services[name] = service
+        logger.debug(f"[SERVICES] Registered '{name}' ({type(service).__name__})")
+        return service
+
+    def get(self, name: str):
+        try:
+            return self._services[name]
+        except KeyError:
+            raise RuntimeError(f"Service '{name}' is not registered; it is created in bot.py before cogs load") from None
+
+    async def close_all(self):
+        """Closes services in reverse registration order; close() may be sync or async."""
+        for name, service in reversed(list(self._services.items())):
+            close = getattr(service, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+                logger.debug(f"[SERVICES] Closed '{name}'")
+            except Exception as e:
+                logger.error(f"[SERVICES] Failed to close '{name}': {e}", exc_info=True)
+        self._services.clear()
+
+
+def get_services(bot) -> ServiceRegistry:
+    registry = getattr(bot, "services", None)
+    if registry is None:
+        registry = bot.services = ServiceRegistry()
+    return registry
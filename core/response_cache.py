@@ -0,0 +1,119 @@
+#core/response_cache.py
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of model responses keyed on (model, system prompt, normalized messages).
+
+    Identical requests that arrive while one is already generating share that
+    generation instead of starting their own.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # {key: (expires_at, response)}
+        self._inflight = {}  # {key: Future}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(model: str, messages: list[dict]) -> str:
+        """Hashes the model and the prompt, ignoring whitespace-only differences."""
+        normalized = [(m.get("role"), _WHITESPACE.sub(" ", m.get("content", "")).strip()) for m in messages]
+        raw = json.dumps([model, normalized], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, key: str, response: str):
+        # Error strings from LLMClient are transient, never cache them
+        if not response or response.startswith("[O-ni]"):
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def run(self, key: str, generate, shareable=None) -> tuple[str | None, bool]:
+        """
+        Returns (response, fresh). `generate` is an async callable that is only
+        awaited on a miss with no identical request in flight; fresh is True
+        only for that caller. If `shareable(response)` is false the response is
+        neither cached nor handed to followers, who get None as on a failure.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            logger.debug(f"[CACHE] Hit for {key[:12]}")
+            return cached, False
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            logger.debug(f"[CACHE] Coalesced onto in-flight request {key[:12]}")
+            return await asyncio.shield(inflight), False
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await generate()
+        except BaseException as e:
+            # Followers must not hang; hand them the failure and let them retry on their own
+            future.set_result(None)
+            raise e
+        else:
+            if shareable is not None and not shareable(response):
+                future.set_result(None)
+            else:
+                self.put(key, response)
+                future.set_result(response)
+            return response, True
+        finally:
+            del self._inflight[key]
+
+    def discard(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
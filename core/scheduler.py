@@ -0,0 +1,180 @@
+#core/scheduler.py
+import asyncio
+import logging
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+
+class SchedulerFull(Exception):
+    """Raised when the wait queue is full and a request cannot be admitted."""
+
+    def __init__(self, queued: int):
+        super().__init__(f"Inference queue is full ({queued} waiting)")
+        self.queued = queued
+
+
+class InferenceTicket:
+    """A slot reservation for one generation. Use it as `async with ticket:`."""
+
+    def __init__(self, scheduler, model: str, guild_id: str, user_id: str):
+        self.scheduler = scheduler
+        self.model = model
+        self.guild_id = str(guild_id)
+        self.user_id = str(user_id)
+        self.granted = asyncio.get_running_loop().create_future()
+
+    @property
+    def position(self) -> int:
+        """1-based position in the model's wait queue, or 0 once the ticket holds a slot."""
+        if self.granted.done():
+            return 0
+        return self.scheduler._position(self)
+
+    def cancel(self):
+        """Gives up a ticket that will never be entered: leaves the queue, or hands back a slot already granted."""
+        if self.granted.done() and not self.granted.cancelled():
+            self.scheduler._release(self)
+        else:
+            self.granted.cancel()
+            self.scheduler._withdraw(self)
+
+    async def __aenter__(self):
+        try:
+            await asyncio.shield(self.granted)
+        except asyncio.CancelledError:
+            # Either still waiting (leave the queue) or granted in the same tick (give the slot back)
+            self.cancel()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler._release(self)
+        return False
+
+
+class InferenceScheduler:
+    """
+    Sits between the cogs and LLMClient.
+
+    Each model gets its own concurrency limit. Waiting requests are served
+    round-robin across guilds, and round-robin across users inside a guild, so
+    one busy server cannot starve the rest. The total number of waiting
+    requests is bounded; past that, submit() raises SchedulerFull.
+    """
+
+    def __init__(self, model_limits: dict | None = None, max_queue: int = 32):
+        self.model_limits = dict(model_limits or {})
+        self.default_limit = self.model_limits.pop("default", 1)
+        self.max_queue = max_queue
+        self._active = {}   # {model: running count}
+        self._waiting = {}  # {model: OrderedDict{guild_id: OrderedDict{user_id: deque[ticket]}}}
+        self._queued = 0
+
+    def limit_for(self, model: str) -> int:
+        return self.model_limits.get(model, self.default_limit)
+
+    def submit(self, model: str, guild_id, user_id) -> InferenceTicket:
+        """Reserves a slot for `model`. The returned ticket is either granted or queued."""
+        ticket = InferenceTicket(self, model, guild_id, user_id)
+
+        if self._active.get(model, 0) < self.limit_for(model) and not self._waiting.get(model):
+            self._active[model] = self._active.get(model, 0) + 1
+            ticket.granted.set_result(None)
+            logger.debug(f"[SCHED] Granted '{model}' immediately to user {user_id} in guild {guild_id}")
+            return ticket
+
+        if self._queued >= self.max_queue:
+            logger.warning(f"[SCHED] Queue full ({self._queued}), rejecting user {user_id} in guild {guild_id}")
+            raise SchedulerFull(self._queued)
+
+        guilds = self._waiting.setdefault(model, OrderedDict())
+        guilds.setdefault(ticket.guild_id, OrderedDict()).setdefault(ticket.user_id, deque()).append(ticket)
+        self._queued += 1
+        logger.debug(f"[SCHED] Queued '{model}' for user {user_id} in guild {guild_id} at position {ticket.position}")
+        return ticket
+
+    def stats(self) -> dict:
+        models = set(self._active) | set(self._waiting)
+        return {
+            model: {
+                "active": self._active.get(model, 0),
+                "limit": self.limit_for(model),
+                "waiting": sum(len(q) for users in self._waiting.get(model, {}).values() for q in users.values()),
+            }
+            for model in models
+        }
+
+    def _order(self, model: str):
+        """Yields waiting tickets in the order they would be dispatched, without mutating the queue."""
+        guilds = [[deque(q) for q in users.values()] for users in self._waiting.get(model, {}).values()]
+        while guilds:
+            users = guilds.pop(0)
+            queue = users.pop(0)
+            yield queue.popleft()
+            if queue:
+                users.append(queue)
+            if users:
+                guilds.append(users)
+
+    def _position(self, ticket: InferenceTicket) -> int:
+        for index, waiting in enumerate(self._order(ticket.model), start=1):
+            if waiting is ticket:
+                return index
+        return 0
+
+    def _pop_next(self, model: str) -> InferenceTicket:
+        guilds = self._waiting[model]
+        guild_id, users = next(iter(guilds.items()))
+        user_id, queue = next(iter(users.items()))
+        ticket = queue.popleft()
+
+        # Rotate: this user goes to the back of the guild, this guild to the back of the model queue
+        if queue:
+            users.move_to_end(user_id)
+        else:
+            del users[user_id]
+        if users:
+            guilds.move_to_end(guild_id)
+        else:
+            del guilds[guild_id]
+        if not guilds:
+            del self._waiting[model]
+
+        self._queued -= 1
+        return ticket
+
+    def _dispatch(self, model: str):
+        while self._waiting.get(model) and self._active.get(model, 0) < self.limit_for(model):
+            ticket = self._pop_next(model)
+            if ticket.granted.done():
+                continue
+            self._active[model] = self._active.get(model, 0) + 1
+            ticket.granted.set_result(None)
+            logger.debug(f"[SCHED] Dispatched '{model}' to user {ticket.user_id} in guild {ticket.guild_id}")
+
+    def _release(self, ticket: InferenceTicket):
+        self._active[ticket.model] = max(0, self._active.get(ticket.model, 0) - 1)
+        self._dispatch(ticket.model)
+
+    def _withdraw(self, ticket: InferenceTicket):
+        users = self._waiting.get(ticket.model, {}).get(ticket.guild_id, {})
+        queue = users.get(ticket.user_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            self._queued -= 1
+            if not queue:
+                del users[ticket.user_id]
+            if not users:
+                del self._waiting[ticket.model][ticket.guild_id]
+            if not self._waiting[ticket.model]:
+                del self._waiting[ticket.model]
+            logger.debug(f"[SCHED] Withdrew queued '{ticket.model}' request for user {ticket.user_id}")
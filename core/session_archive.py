@@ -0,0 +1,235 @@
+#core/session_archive.py
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+INDEX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS archived (
+        user_id INTEGER NOT NULL,
+        session_name TEXT NOT NULL,
+        pack TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        message_count INTEGER NOT NULL,
+        raw_bytes INTEGER NOT NULL,
+        updated_at REAL NOT NULL,
+        archived_at REAL NOT NULL,
+        summary TEXT,
+        cursor INTEGER,
+        PRIMARY KEY (user_id, session_name)
+    );
+"""
+# Compact a pack once more than this share of it belongs to sessions that were restored
+COMPACT_GARBAGE_RATIO = 0.5
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+class SessionArchive:
+    """
+    Cold tier for sessions nobody has touched in a while, one directory per
+    guild under `root/<guild_id>/archive/`:
+
+        sessions-<n>.pack  zlib-compressed JSON histories, back to back, append-only
+        index.db           where each one lives, plus its pinned summary
+
+    Lookups open the index read-only. Frames are fsynced before the index
+    row that points at them is committed, and compaction writes a new pack
+    before repointing the index, so a crash never leaves a row pointing at
+    bytes that are not there. Compaction is skipped while sessions() is
+    being iterated (an export on another thread), since it unlinks packs.
+    """
+
+    def __init__(self, root, level: int = 9):
+        self.root = Path(root)
+        self.level = level
+        self._lock = threading.Lock()  # held for a whole compaction
+        self._readers = 0
+
+    def _dir(self, guild_id) -> Path:
+        return self.root / str(int(guild_id)) / "archive"
+
+    def _connect(self, guild_id, write: bool = False) -> sqlite3.Connection | None:
+        index_path = self._dir(guild_id) / "index.db"
+        if write:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(index_path)
+            conn.execute(INDEX_SCHEMA)
+            return conn
+        if not index_path.exists():
+            return None
+        return sqlite3.connect(f"file:{index_path.as_posix()}?mode=ro", uri=True)
+
+    def guild_ids(self) -> list[int]:
+        return sorted(int(p.parent.parent.name) for p in self.root.glob("*/archive/index.db") if p.parent.parent.name.isdigit())
+
+    def add(self, guild_id, sessions: list[dict]) -> int:
+        """
+        Archives {user_id, name, messages, updated_at, summary, cursor} dicts;
+        an existing archived copy of the same session is replaced. Returns the
+        number of compressed bytes written.
+        """
+        if not sessions:
+            return 0
+        rows = []
+        with closing(self._connect(guild_id, write=True)) as conn:
+            pack = self._current_pack(conn)
+            with open(self._dir(guild_id) / pack, "ab") as f:
+                for session in sessions:
+                    raw = json.dumps(session["messages"], ensure_ascii=False).encode("utf-8")
+                    frame = zlib.compress(raw, self.level)
+                    rows.append((int(session["user_id"]), session["name"], pack, f.tell(), len(frame), len(session["messages"]),
+                                 len(raw), session["updated_at"], time.time(), session.get("summary"), session.get("cursor")))
+                    f.write(frame)
+                f.flush()
+                os.fsync(f.fileno())
+            with conn:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO archived
+                    (user_id, session_name, pack, offset, length, message_count, raw_bytes, updated_at, archived_at, summary, cursor)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+                """, rows)
+        return sum(row[4] for row in rows)
+
+    @staticmethod
+    def _pack_number(pack: str) -> int:
+        return int(pack[len("sessions-"):-len(".pack")])
+
+    def _current_pack(self, conn) -> str:
+        packs = [row[0] for row in conn.execute("SELECT DISTINCT pack FROM archived;")]
+        return max(packs, key=self._pack_number) if packs else "sessions-1.pack"
+
+    def _read_frame(self, guild_id, pack: str, offset: int, length: int) -> list[dict]:
+        with open(self._dir(guild_id) / pack, "rb") as f:
+            f.seek(offset)
+            return json.loads(zlib.decompress(f.read(length)).decode("utf-8"))
+
+    def names_for(self, guild_id, user_id) -> list[str]:
+        conn = self._connect(guild_id)
+        if conn is None:
+            return []
+        with closing(conn):
+            return [row[0] for row in conn.execute(
+                "SELECT session_name FROM archived WHERE user_id = ? ORDER BY updated_at DESC;", (int(user_id),))]
+
+    def load(self, guild_id, user_id, session_name: str) -> dict | None:
+        """{messages, summary, cursor} for an archived session, or None."""
+        conn = self._connect(guild_id)
+        if conn is None:
+            return None
+        with closing(conn):
+            row = conn.execute("""
+                SELECT pack, offset, length, summary, cursor FROM archived
+                WHERE user_id = ? AND session_name = ?;
+            """, (int(user_id), session_name)).fetchone()
+        if row is None:
+            return None
+        pack, offset, length, summary, cursor = row
+        try:
+            messages = self._read_frame(guild_id, pack, offset, length)
+        except (OSError, zlib.error, ValueError) as e:
+            logger.error(f"[ARCHIVE] Archived session '{session_name}' of user {user_id} in guild {guild_id} is unreadable: {e}", exc_info=True)
+            return None
+        return {"messages": messages, "summary": summary, "cursor": cursor}
+
+    def sessions(self, guild_id, user_id=None, skipped: list | None = None):
+        """
+        Yields (user_id, session_name, messages) for every archived session of a
+        guild, or of one user in it. Unreadable ones are logged and appended to
+        `skipped` as (guild_id, user_id, session_name).
+        """
+        # Waits for a running compaction, and holds off new ones until we are done
+        with self._lock:
+            self._readers += 1
+        try:
+            conn = self._connect(guild_id)
+            if conn is None:
+                return
+            with closing(conn):
+                sql = "SELECT user_id, session_name, pack, offset, length FROM archived"
+                rows = conn.execute(sql + " WHERE user_id = ?;", (int(user_id),)).fetchall() if user_id is not None else conn.execute(sql + ";").fetchall()
+            for archived_user, session_name, pack, offset, length in rows:
+                try:
+                    messages = self._read_frame(guild_id, pack, offset, length)
+                except (OSError, zlib.error, ValueError) as e:
+                    logger.error(f"[ARCHIVE] Skipping unreadable archived session '{session_name}' of user {archived_user}: {e}")
+                    if skipped is not None:
+                        skipped.append((int(guild_id), archived_user, session_name))
+                    continue
+                yield archived_user, session_name, messages
+        finally:
+            with self._lock:
+                self._readers -= 1
+
+    def remove(self, guild_id, user_id, session_name: str):
+        """Drops a session from the index once it is back in the hot tier; its bytes go at the next compaction."""
+        if not (self._dir(guild_id) / "index.db").exists():
+            return
+        with closing(self._connect(guild_id, write=True)) as conn, conn:
+            conn.execute("DELETE FROM archived WHERE user_id = ? AND session_name = ?;", (int(user_id), session_name))
+
+    def compact(self, guild_id, force: bool = False) -> int:
+        """Rewrites a guild's packs without restored sessions once they are mostly garbage. Returns bytes freed."""
+        with self._lock:
+            if self._readers:
+                logger.debug(f"[ARCHIVE] Archive is being read, deferring compaction of guild {guild_id}")
+                return 0
+            return self._compact(guild_id, force)
+
+    def _compact(self, guild_id, force: bool) -> int:
+        archive_dir = self._dir(guild_id)
+        if not (archive_dir / "index.db").exists():
+            return 0
+        with closing(self._connect(guild_id, write=True)) as conn:
+            packs = [p for p in archive_dir.glob("sessions-*.pack")]
+            on_disk = sum(p.stat().st_size for p in packs)
+            live = conn.execute("SELECT COALESCE(SUM(length), 0) FROM archived;").fetchone()[0]
+            garbage = on_disk - live
+            if not force and (garbage < COMPACT_MIN_BYTES or garbage < on_disk * COMPACT_GARBAGE_RATIO):
+                return 0
+
+            new_pack = f"sessions-{max((self._pack_number(p.name) for p in packs), default=0) + 1}.pack"
+            moves = []
+            with open(archive_dir / new_pack, "wb") as out:
+                for user_id, session_name, pack, offset, length in conn.execute(
+                        "SELECT user_id, session_name, pack, offset, length FROM archived ORDER BY pack, offset;").fetchall():
+                    with open(archive_dir / pack, "rb") as f:
+                        f.seek(offset)
+                        frame = f.read(length)
+                    moves.append((new_pack, out.tell(), user_id, session_name))
+                    out.write(frame)
+                out.flush()
+                os.fsync(out.fileno())
+            with conn:
+                conn.executemany("UPDATE archived SET pack = ?, offset = ? WHERE user_id = ? AND session_name = ?;", moves)
+        for pack in packs:
+            pack.unlink(missing_ok=True)
+        freed = on_disk - (archive_dir / new_pack).stat().st_size
+        logger.info(f"[ARCHIVE] Compacted the archive of guild {guild_id}, freeing {freed / 1024:.0f} KB")
+        return freed
+
+    def stats(self, guild_id) -> dict:
+        conn = self._connect(guild_id)
+        if conn is None:
+            return {"sessions": 0, "messages": 0, "raw_bytes": 0, "stored_bytes": 0}
+        with closing(conn):
+            sessions, messages, raw_bytes, stored_bytes = conn.execute("""
+                SELECT COUNT(*), COALESCE(SUM(message_count), 0), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(length), 0)
+                FROM archived;
+            """).fetchone()
+        return {"sessions": sessions, "messages": messages, "raw_bytes": raw_bytes, "stored_bytes": stored_bytes}
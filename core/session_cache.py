@@ -0,0 +1,119 @@
+#core/session_cache.py
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+# Rough per-message cost of the dict, its two keys and the list slot on CPython
+MESSAGE_OVERHEAD = 232
+
+
+def estimate_size(messages: list, start: int = 0) -> int:
+    """Approximate bytes held by messages[start:]."""
+    return sum(MESSAGE_OVERHEAD + len(m.get("content", "")) + len(m.get("role", "")) for m in messages[start:])
+
+
+class SessionCache:
+    """
+    LRU cache of session histories keyed on (guild_id, user_id, session_name),
+    bounded by entry count and by approximate bytes.
+
+    Evicted entries are handed to `on_evict(key, messages)` while they are
+    still cached, and only removed once it returns, so the owner can take over
+    anything that was not persisted yet without the session ever being
+    visible nowhere.
+    The most recently used entry is never evicted, even if it alone is over the
+    byte budget.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024, on_evict=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # {key: (messages, size)}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def keys(self):
+        return list(self._entries)
+
+    def get(self, key: tuple) -> list | None:
+        """Counted lookup that refreshes the entry's recency."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def peek(self, key: tuple) -> list | None:
+        """Lookup that neither counts nor touches recency; safe to call from the flusher thread."""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def put(self, key: tuple, messages: list):
+        old = self._entries.get(key)
+        if old is not None and len(messages) >= len(old[0]) and old[0] and messages[len(old[0]) - 1] is old[0][-1]:
+            # A turn appended to the cached history: only size the new tail
+            size = old[1] + estimate_size(messages, len(old[0]))
+        else:
+            size = estimate_size(messages)
+        if old is not None:
+            self.bytes -= old[1]
+        self._entries[key] = (messages, size)
+        self._entries.move_to_end(key)
+        self.bytes += size
+        self._evict()
+
+    def pop(self, key: tuple) -> list | None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.bytes -= entry[1]
+        return entry[0]
+
+    def names_for(self, guild_id: str, user_id: str) -> list[str]:
+        return [name for (g, u, name) in self._entries if g == guild_id and u == user_id]
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def _evict(self):
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            key, (messages, _) = next(iter(self._entries.items()))
+            if self.on_evict is not None:
+                self.on_evict(key, messages)
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+            self.evictions += 1
+            logger.debug(f"[CACHE] Evicted session '{key[2]}' for user {key[1]} in guild {key[0]} ({len(messages)} messages)")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
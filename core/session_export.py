@@ -0,0 +1,109 @@
+#core/session_export.py
+import json
+import zlib
+import logging
+import zipfile
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+COMPRESS_LEVEL = 6
+# Local header (30) + central directory record (46) per entry, plus room for extra fields
+ENTRY_OVERHEAD = 30 + 46 + 32
+END_OF_ARCHIVE = 22
+
+
+class SessionExport:
+    """
+    Writes sessions into `<prefix>-<n>.zip` parts under `out_dir`, one
+    `<guild_id>/<user_id>/<session_name>.json` entry per session, starting a
+    new part before one would grow past `max_part_bytes`.
+
+    `run()` is meant for a worker thread; the event loop polls `progress()`
+    and picks up each part from `take_parts()` as soon as it is closed, so
+    only the part being written has to sit on disk. A deflated entry's size
+    has to be known before it goes in, so each one is compressed once to
+    measure it; zipfile produces the same stream when it writes it.
+    """
+
+    def __init__(self, out_dir, prefix: str, max_part_bytes: int):
+        self.out_dir = Path(out_dir)
+        self.prefix = prefix
+        self.max_part_bytes = max_part_bytes
+        self.sessions = 0
+        self.messages = 0
+        self.bytes_written = 0  # across closed parts
+        self.oversized = []  # entries that exceed max_part_bytes on their own
+        self.skipped = []  # (guild_id, user_id, session_name) the producer could not read
+        self._lock = threading.Lock()
+        self._ready = []  # closed parts nobody has taken yet
+        self._part_count = 0
+        self._zip = None
+        self._part_bytes = 0
+
+    def _open_part(self):
+        self._part_count += 1
+        path = self.out_dir / f"{self.prefix}-{self._part_count}.zip"
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL)
+        self._part_bytes = END_OF_ARCHIVE
+
+    def _close_part(self):
+        if self._zip is None:
+            return
+        path = Path(self._zip.filename)
+        self._zip.close()
+        self._zip = None
+        size = path.stat().st_size
+        with self._lock:
+            self.bytes_written += size
+            self._ready.append(path)
+        logger.debug(f"[EXPORT] Closed {path.name} ({size / 1024:.0f} KB)")
+
+    def add(self, guild_id, user_id, session_name: str, messages):
+        name = f"{guild_id}/{user_id}/{session_name}.json"
+        # Rows from the pre-v1 table already hold the JSON text
+        data = (messages if isinstance(messages, str) else json.dumps(messages, indent=4)).encode("utf-8")
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        size = len(compressor.compress(data)) + len(compressor.flush()) + ENTRY_OVERHEAD + 2 * len(name.encode("utf-8"))
+
+        if self._zip is not None and self._part_bytes + size > self.max_part_bytes:
+            self._close_part()
+        if self._zip is None:
+            self._open_part()
+        if END_OF_ARCHIVE + size > self.max_part_bytes:
+            self.oversized.append(name)
+            logger.warning(f"[EXPORT] {name} is larger than the upload limit on its own ({size / 1024 / 1024:.1f} MB)")
+        self._zip.writestr(name, data)
+        self._part_bytes += size
+        with self._lock:
+            self.sessions += 1
+            self.messages += len(messages) if not isinstance(messages, str) else 0
+
+    def run(self, sessions):
+        """Writes every (guild_id, user_id, session_name, messages) from `sessions`, then closes the last part."""
+        try:
+            for guild_id, user_id, session_name, messages in sessions:
+                self.add(guild_id, user_id, session_name, messages)
+        finally:
+            self._close_part()
+        logger.info(f"[EXPORT] Exported {self.sessions} sessions into {self._part_count} parts ({self.bytes_written / 1024:.0f} KB)")
+
+    def take_parts(self) -> list[Path]:
+        """Parts closed since the last call, in order."""
+        with self._lock:
+            parts, self._ready = self._ready, []
+        return parts
+
+    def progress(self) -> dict:
+        with self._lock:
+            return {"sessions": self.sessions, "messages": self.messages, "parts": self._part_count,
+                    "bytes": self.bytes_written + (self._part_bytes if self._zip is not None else 0)}
@@ -0,0 +1,186 @@
+#core/session_journal.py
+import os
+import json
+import asyncio
+import time
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+
+class SessionJournal:
+    """
+    Append-only JSONL log of session mutations, one record per line:
+
+        {"op": "set", "k": [guild_id, user_id, name], "m": [messages]}   full history
+        {"op": "append", "k": [...], "from": n, "m": [messages]}         history[:n] + m
+        {"op": "del", "k": [...]}                                         session deleted
+
+    Records are written as they happen; a syncer thread fsyncs them in
+    groups, at most every `commit_interval` seconds, and `wait_durable(lsn)`
+    blocks until a record is on disk (`durable_future(lsn)` is the asyncio
+    equivalent, resolved by the syncer without tying up a thread). `checkpoint()` swaps the file for a
+    snapshot of what the database does not hold yet, which bounds how much
+    has to be replayed after a crash.
+    """
+
+    def __init__(self, path, commit_interval: float = 0.05):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.commit_interval = commit_interval
+        self.written_lsn = 0  # records handed to the file
+        self.durable_lsn = 0  # records known to be fsynced
+        self._lock = threading.Lock()  # file writes and rotation
+        self._synced = threading.Condition()
+        self._waiters = []  # [(lsn, loop, future)] resolved once durable_lsn reaches lsn
+        self._closing = False
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self.path.stat().st_size
+        self._syncer = threading.Thread(target=self._sync_loop, name="session-journal", daemon=True)
+        self._syncer.start()
+
+    @staticmethod
+    def _encode(record: dict) -> str:
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+    def read(self) -> list[dict]:
+        """Every complete record in the journal; a torn last line from a crash is ignored."""
+        records = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"[JOURNAL] Ignoring a torn record at the end of {self.path}")
+                    break
+                if isinstance(record, dict) and "op" in record:
+                    records.append(record)
+        return records
+
+    def size(self) -> int:
+        return self._size
+
+    def append(self, record: dict) -> int:
+        """Queues a record for the next group commit; returns its log sequence number."""
+        line = self._encode(record)
+        with self._lock:
+            self._file.write(line)
+            self._size += len(line.encode("utf-8"))
+            self.written_lsn += 1
+            lsn = self.written_lsn
+        with self._synced:
+            self._synced.notify_all()
+        return lsn
+
+    def wait_durable(self, lsn: int, timeout: float | None = None) -> bool:
+        with self._synced:
+            return self._synced.wait_for(lambda: self.durable_lsn >= lsn or self._closing, timeout)
+
+    def durable_future(self, lsn: int) -> asyncio.Future:
+        """A future on the running loop that completes once record `lsn` is on disk."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._synced:
+            if self.durable_lsn >= lsn or self._closing:
+                future.set_result(None)
+            else:
+                self._waiters.append((lsn, loop, future))
+        return future
+
+    @staticmethod
+    def _resolve(future: asyncio.Future):
+        if not future.done():  # the waiter may have been cancelled meanwhile
+            future.set_result(None)
+
+    def _mark_durable(self, lsn: int):
+        """Advances durable_lsn and wakes everyone waiting on it; call with `_synced` held."""
+        self.durable_lsn = max(self.durable_lsn, lsn)
+        self._synced.notify_all()
+        ready = [w for w in self._waiters if w[0] <= self.durable_lsn or self._closing]
+        if ready:
+            self._waiters = [w for w in self._waiters if w not in ready]
+            for _, loop, future in ready:
+                try:
+                    loop.call_soon_threadsafe(self._resolve, future)
+                except RuntimeError:
+                    pass  # loop already closed; nobody is waiting any more
+
+    def _sync_loop(self):
+        while True:
+            with self._synced:
+                self._synced.wait_for(lambda: self.written_lsn > self.durable_lsn or self._closing)
+                if self._closing:
+                    return
+            # Let records from concurrent writers pile up so one fsync covers them all
+            time.sleep(self.commit_interval)
+            try:
+                self.sync()
+            except OSError as e:
+                logger.error(f"[JOURNAL] fsync of {self.path} failed: {e}", exc_info=True)
+                time.sleep(1)
+
+    def sync(self):
+        with self._lock:
+            self._file.flush()
+            lsn = self.written_lsn
+            # Our own descriptor: writers keep appending during the fsync, and a
+            # checkpoint can close the file without pulling it from under us
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        with self._synced:
+            self._mark_durable(lsn)
+
+    def checkpoint(self, snapshot) -> int:
+        """
+        Replaces the journal with `snapshot()`'s records, written and fsynced
+        before the swap. `snapshot` runs with appends blocked, so it must
+        capture every change the database does not hold yet. Returns its size.
+        """
+        with self._lock:
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(self._encode(record) for record in snapshot())
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._fsync_dir()
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._size = size = self.path.stat().st_size
+            lsn = self.written_lsn
+        with self._synced:
+            # Everything appended so far is now either in the database or in the snapshot
+            self._mark_durable(lsn)
+        return size
+
+    def _fsync_dir(self):
+        # Makes the rename itself durable; directories cannot be opened this way on Windows
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(self.path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        self.sync()
+        with self._synced:
+            self._closing = True
+            self._mark_durable(self.durable_lsn)
+        self._syncer.join(timeout=5)
+        with self._lock:
+            self._file.close()
@@ -1,10 +1,22 @@
 import os
+import re
 import json
+import time
 import sqlite3
 import logging
+import unicodedata
+import threading
 from pathlib import Path
+from contextlib import contextmanager
 from typing import List, Dict, Any
 
+from core.db_pool import SQLitePool
+from core.shard_set import ShardSet
+from core.session_cache import SessionCache
+from core.session_journal import SessionJournal
+from core.session_archive import SessionArchive
+from core.storage_codec import MessageCodec
+
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -16,49 +28,742 @@ if not logger.hasHandlers():
     ch.setFormatter(formatter)
     logger.addHandler(ch)
 
+# Bumped whenever the on-disk layout changes; stored in PRAGMA user_version
+#   v1: sessions + append-only session_messages (v0 was one JSON blob per session)
+#   v2: guild_id/user_id stored as INTEGER snowflakes, per-user index
+#   v3: session_fts full-text index over message content
+SCHEMA_VERSION = 3
+MIGRATION_BATCH = 500
+SEARCH_SNIPPET_CHARS = 160
+
+SESSIONS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        session_id INTEGER PRIMARY KEY,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        session_name TEXT NOT NULL,
+        message_count INTEGER NOT NULL DEFAULT 0,
+        updated_at REAL NOT NULL,
+        UNIQUE (guild_id, user_id, session_name)
+    );
+"""
+SUMMARIES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        session_name TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        cursor INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, user_id, session_name)
+    );
+"""
+MESSAGES_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS session_messages (
+        message_id INTEGER PRIMARY KEY,
+        session_id INTEGER NOT NULL,
+        seq INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        UNIQUE (session_id, seq)
+    );
+"""
+# Contentless: content may be stored compressed, so the index keeps only its own
+# postings and snippets are cut from the decoded message. rowid is the message_id;
+# scope ("g<guild_id>u<user_id>") confines a search to one user's sessions in one guild.
+FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS session_fts USING fts5(
+        scope, content, content='', tokenize='unicode61 remove_diacritics 2'
+    );
+"""
+# Per-guild lookups use the (guild_id, user_id, session_name) unique index; per-user ones need their own
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id, session_name);",
+)
+
+SQL_SESSION_ID = "SELECT session_id FROM sessions WHERE guild_id = ? AND user_id = ? AND session_name = ?;"
+SQL_READ_MESSAGES = "SELECT role, content FROM session_messages WHERE session_id = ? ORDER BY seq;"
+SQL_USER_GUILD_NAMES = "SELECT session_name FROM sessions WHERE guild_id = ? AND user_id = ?;"
+SQL_USER_SESSIONS = "SELECT session_id, session_name FROM sessions WHERE user_id = ?;"
+SQL_USER_SESSION_BY_NAME = "SELECT session_id FROM sessions WHERE user_id = ? AND session_name = ?;"
+SQL_GUILD_SESSIONS = "SELECT user_id, session_name, message_count, updated_at FROM sessions WHERE guild_id = ?;"
+SQL_SEARCH = """
+    SELECT rowid, bm25(session_fts, 0.0, 1.0) AS score FROM session_fts
+    WHERE session_fts MATCH ? ORDER BY score LIMIT ?;
+"""
+SQL_SEARCH_HITS = """
+    SELECT m.message_id, s.session_name, m.seq, m.role, m.content
+    FROM session_messages m JOIN sessions s ON s.session_id = m.session_id
+    WHERE m.message_id IN ({marks});
+"""
+SQL_RETENTION_SIZES = """
+    SELECT s.user_id, s.session_name, s.updated_at, COALESCE(SUM(LENGTH(m.content)), 0)
+    FROM sessions s LEFT JOIN session_messages m ON m.session_id = s.session_id
+    WHERE s.guild_id = ?
+    GROUP BY s.session_id ORDER BY s.updated_at;
+"""
+SQL_SESSIONS_PAGE = """
+    SELECT session_id, guild_id, user_id, session_name FROM sessions
+    WHERE session_id > ? ORDER BY session_id LIMIT ?;
+"""
+
+# Statements on the hot paths; check_query_plans() makes sure none of them scans a table
+QUERY_PLAN_CHECKS = {
+    "session by key": (SQL_SESSION_ID, (1, 1, "default")),
+    "messages of a session": (SQL_READ_MESSAGES, (1,)),
+    "sessions of a user in a guild": (SQL_USER_GUILD_NAMES, (1, 1)),
+    "sessions of a user": (SQL_USER_SESSIONS, (1,)),
+    "user session by name": (SQL_USER_SESSION_BY_NAME, (1, "default")),
+    "sessions of a guild": (SQL_GUILD_SESSIONS, (1,)),
+    "search": (SQL_SEARCH, ('"scope" "word"', 5)),
+    "search hits": (SQL_SEARCH_HITS.format(marks="?, ?"), (1, 2)),
+    "retention sizes of a guild": (SQL_RETENTION_SIZES, (1,)),
+    "export page": (SQL_SESSIONS_PAGE, (0, 200)),
+}
+
+
+def _is_scan(detail: str) -> bool:
+    # A virtual table always reports SCAN; FTS5 only walks its postings when MATCH ("M") is in the index string
+    match = re.match(r"SCAN \S+ VIRTUAL TABLE INDEX \d+:(\S*)", detail)
+    if match:
+        return "M" not in match.group(1)
+    return detail.startswith("SCAN")
+
+
+def check_query_plans() -> dict[str, str]:
+    """
+    Runs EXPLAIN QUERY PLAN over the hot statements against an empty in-memory
+    copy of the schema; returns {name: plan} for any that scans a table. A
+    scratch database keeps the result about the schema, not about whatever
+    sqlite_stat1 says for the data a given bot happens to hold.
+    """
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute(SESSIONS_SCHEMA.format(table="sessions"))
+        conn.execute(MESSAGES_SCHEMA)
+        conn.execute(SUMMARIES_SCHEMA.format(table="session_summaries"))
+        conn.execute(FTS_SCHEMA)
+        for statement in INDEXES:
+            conn.execute(statement)
+        scans = {}
+        for name, (sql, params) in QUERY_PLAN_CHECKS.items():
+            plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+            if any(_is_scan(detail) for detail in plan):
+                scans[name] = "; ".join(plan)
+        return scans
+    finally:
+        conn.close()
+
+
+def _scope(key: tuple) -> str:
+    return f"g{int(key[0])}u{int(key[1])}"
+
+
+def _fts_query(text: str) -> str | None:
+    """Quotes every word so user input is matched literally instead of parsed as FTS5 syntax."""
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    return " ".join(terms) if terms else None
+
+
+# Roughly FTS5's unicode61 tokenizer: runs of letters and digits, compared case- and accent-insensitively
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def _fold(token: str) -> str:
+    """A token as unicode61 with remove_diacritics 2 indexes it."""
+    return "".join(c for c in unicodedata.normalize("NFKD", token.casefold()) if not unicodedata.combining(c))
+
+
+# Characters that would let message text break the snippet's Discord formatting
+MARKDOWN_RE = re.compile(r"[\\*_~`|]")
+
+
+def _snap(content: str, pos: int) -> int:
+    """Moves `pos` back to the start of the token it would cut in two."""
+    while 0 < pos < len(content) and TOKEN_RE.match(content, pos - 1) and TOKEN_RE.match(content, pos):
+        pos -= 1
+    return pos
+
+
+def _escape_markdown(text: str) -> str:
+    return MARKDOWN_RE.sub(lambda m: "\\" + m.group(), text)
+
+
+def make_snippet(content: str, terms: list[str], width: int = SEARCH_SNIPPET_CHARS) -> str:
+    """
+    A window of `content` around the first query term, with the terms in bold.
+    Text is split into tokens the way the index splits it, so only whole
+    tokens that the search actually matched are highlighted, and the window
+    never starts or ends mid-token. A term the tokenizer would split (`C++`)
+    is bolded as written where it appears verbatim, not just its `C`.
+    """
+    wanted = {_fold(token) for term in terms for token in TOKEN_RE.findall(term)}
+    first = next((m.start() for m in TOKEN_RE.finditer(content) if _fold(m.group()) in wanted), None)
+    start = _snap(content, max(0, first - width // 3)) if first is not None else 0
+    end = _snap(content, start + width)
+    if end <= (first if first is not None else start):
+        end = start + width  # one token longer than the window; cut it rather than show nothing
+    snippet = content[start:end].replace("\n", " ")
+
+    verbatim = sorted({term for term in terms if TOKEN_RE.search(term) and not TOKEN_RE.fullmatch(term)}, key=len, reverse=True)
+    parts = [rf"(?P<term>(?<![^\W_])(?:{'|'.join(map(re.escape, verbatim))})(?![^\W_]))"] if verbatim else []
+    pattern = re.compile("|".join(parts + [rf"(?P<token>{TOKEN_RE.pattern})", rf"(?P<markdown>{MARKDOWN_RE.pattern})"]), re.IGNORECASE)
+
+    def highlight(m):
+        if m.lastgroup == "term":
+            return f"**{_escape_markdown(m.group())}**"
+        if m.lastgroup == "token":
+            return f"**{m.group()}**" if _fold(m.group()) in wanted else m.group()
+        return _escape_markdown(m.group())
+
+    snippet = pattern.sub(highlight, snippet)
+    return ("…" if start else "") + snippet + ("…" if end < len(content) else "")
+
+
+def _db_key(key: tuple) -> tuple:
+    """(guild_id, user_id, session_name) as bound in SQL: ids are INTEGER columns since schema v2."""
+    return int(key[0]), int(key[1]), key[2]
+
+
 class SessionManager:
-    def __init__(self, db_path: str, max_sessions: int = 5):
+    def __init__(self, db_path: str, max_sessions: int = 5, db_readers: int = 4,
+                 flush_interval: float = 2.0, max_staleness: float = 10.0,
+                 cache_entries: int = 512, cache_bytes: int = 64 * 1024 * 1024,
+                 compression: bool = False, compression_level: int = 6,
+                 shard_root: str | None = None, shard_file: str = "oni_bot.db",
+                 max_open_shards: int = 32, shard_readers: int = 2,
+                 journal_path: str | None = None, journal_commit_interval: float = 0.05,
+                 journal_checkpoint_bytes: int = 8 * 1024 * 1024, archive_root: str | None = None):
         self.db_path = Path(db_path)
+        self.codec = MessageCodec(enabled=compression, level=compression_level)
+        self.archive = SessionArchive(archive_root) if archive_root is not None else None  # cold tier, see apply_retention
         self.max_sessions = max_sessions
-        self.temp_sessions = {}  # in-memory cache
-        self._initialize_db()
-
-    def _initialize_db(self):
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS sessions (
-                    guild_id TEXT NOT NULL,
-                    user_id TEXT NOT NULL,
-                    session_name TEXT NOT NULL,
-                    messages TEXT NOT NULL,
-                    PRIMARY KEY (guild_id, user_id, session_name)
-                );
-            """)
-            conn.commit()
-            conn.close()
-            logger.info(f"[AI] SQLite database initialized at {self.db_path}")
+        self.temp_sessions = SessionCache(cache_entries, cache_bytes, on_evict=self._write_back)
+        self._pending_writeback = {}  # {key: messages} evicted while dirty, until their DB write commits
+        self.summaries = {}  # {(guild_id, user_id, session_name): (summary, cursor)}
+        self._session_ids = {}  # {(guild_id, user_id, session_name): session_id}
+        self._persisted = {}  # {(guild_id, user_id, session_name): shallow copy of the history last written}
+        self._legacy = False  # a pre-v1 `sessions_legacy` table still holds unmigrated rows
+
+        # Sharded mode keeps each guild's sessions in shard_root/<guild_id>/<shard_file>, so
+        # guilds no longer queue behind one write lock; db_path is then only read once, to
+        # split an existing monolithic database into the shards.
+        if shard_root is None:
+            self.shards = None
+            self.db = SQLitePool(self.db_path, readers=db_readers)
+            self._legacy = self._initialize_db(self.db, self.db_path)
+            if self._legacy:
+                self._migrate_legacy(self.db)
+        else:
+            self.shards = ShardSet(shard_root, shard_file, self._open_shard, max_open=max_open_shards)
+            self.shard_readers = shard_readers
+            self.db = None
+            if self.db_path.exists():
+                self._split_monolith(db_readers)
+        for name, detail in check_query_plans().items():
+            logger.warning(f"[DB] Query '{name}' scans instead of using an index: {detail}")
+
+        # Write-behind: update_session only marks a session dirty; the flusher thread
+        # writes dirty sessions once they have been quiet for flush_interval seconds,
+        # and never lets one stay unwritten for more than max_staleness seconds.
+        self.flush_interval = flush_interval
+        self.max_staleness = max_staleness
+        self._dirty = set()  # {(guild_id, user_id, session_name)}
+        self._dirty_since = None
+        self._last_change = 0.0
+        self._closing = False
+        self._checkpoint_due = False  # the journal outgrew journal_checkpoint_bytes; flush without waiting
+        self._changed = threading.Condition()
+        self._flush_lock = threading.RLock()  # one flush at a time, and deletes/write-backs never race a flush
+
+        # Every mutation is journaled before update_session returns, so the write-behind
+        # window above costs nothing on a crash: the journal is replayed here at startup.
+        self.journal = None
+        self.journal_checkpoint_bytes = journal_checkpoint_bytes
+        if journal_path is not None:
+            self.journal = SessionJournal(journal_path, commit_interval=journal_commit_interval)
+            self._replay_journal()
+
+        self._flusher = threading.Thread(target=self._flush_loop, name=f"session-flush:{self.db_path.name}", daemon=True)
+        self._flusher.start()
+
+    def _initialize_db(self, db: SQLitePool, db_path: Path) -> bool:
+        """Creates or upgrades the schema of one database file; returns whether v0 legacy rows await migration."""
+        try:
+            with db.writer() as conn:
+                conn.execute("BEGIN IMMEDIATE;")  # the whole upgrade commits or nothing does
+                version = conn.execute("PRAGMA user_version;").fetchone()[0]
+                if version < 1 and self._table_columns(conn, "sessions") and "messages" in self._table_columns(conn, "sessions"):
+                    # v0 kept each conversation as one JSON blob; move it aside and split it below
+                    conn.execute("ALTER TABLE sessions RENAME TO sessions_legacy;")
+                    logger.info(f"[DB] Migrating {db_path} from JSON-blob sessions to schema v{SCHEMA_VERSION}")
+                elif version == 1:
+                    self._upgrade_to_integer_keys(conn, db_path)
+                conn.execute(SESSIONS_SCHEMA.format(table="sessions"))
+                conn.execute(MESSAGES_SCHEMA)
+                conn.execute(SUMMARIES_SCHEMA.format(table="session_summaries"))
+                conn.execute(FTS_SCHEMA)
+                for statement in INDEXES:
+                    conn.execute(statement)
+                if version < 3:
+                    self._build_search_index(conn, db_path)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+                legacy = bool(self._table_columns(conn, "sessions_legacy"))
+            logger.info(f"[AI] SQLite database initialized at {db_path}")
+            return legacy
         except sqlite3.Error as e:
-            logger.error(f"[ERROR] Failed to initialize SQLite database at {self.db_path}: {e}", exc_info=True)
+            logger.error(f"[ERROR] Failed to initialize SQLite database at {db_path}: {e}", exc_info=True)
             raise
 
-    def _get_db_connection(self):
-        return sqlite3.connect(self.db_path)
+    def _open_shard(self, path: Path) -> SQLitePool:
+        db = SQLitePool(path, readers=self.shard_readers)
+        try:
+            self._initialize_db(db, path)
+        except sqlite3.Error:
+            db.close()
+            raise
+        return db
 
-    def _load_session_from_db(self, guild_id: str, user_id: str, session_name: str) -> List[Dict[str, str]] | None:
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
+    def _split_monolith(self, readers: int):
+        """
+        Moves every guild's sessions and summaries out of db_path into its
+        shard, one guild per transaction. A session already present in the
+        shard is left alone, so a split interrupted between the shard commit
+        and the delete below simply picks up where it stopped. Once nothing is
+        left the monolith is renamed to `<name>.split` and never read again.
+        """
+        mono = SQLitePool(self.db_path, readers=readers)
         try:
-            cursor.execute("""
-                SELECT messages FROM sessions
+            self._legacy = self._initialize_db(mono, self.db_path)
+            if self._legacy:
+                self._migrate_legacy(mono)
+            with mono.reader() as conn:
+                guild_ids = [row[0] for row in conn.execute("SELECT guild_id FROM sessions UNION SELECT guild_id FROM session_summaries;")]
+            if guild_ids:
+                logger.info(f"[DB] Splitting {self.db_path} into per-guild shards ({len(guild_ids)} guilds)")
+
+            moved = 0
+            for guild_id in guild_ids:
+                with self.shards.use(guild_id) as shard, shard.writer() as dst, mono.reader() as src:
+                    sessions = src.execute("""
+                        SELECT session_id, user_id, session_name, message_count, updated_at
+                        FROM sessions WHERE guild_id = ?;
+                    """, (guild_id,)).fetchall()
+                    for session_id, user_id, session_name, message_count, updated_at in sessions:
+                        cur = dst.execute("""
+                            INSERT OR IGNORE INTO sessions (guild_id, user_id, session_name, message_count, updated_at)
+                            VALUES (?, ?, ?, ?, ?);
+                        """, (guild_id, user_id, session_name, message_count, updated_at))
+                        if not cur.rowcount:
+                            continue
+                        # Content is copied as stored, so compressed rows stay compressed
+                        dst.executemany("""
+                            INSERT INTO session_messages (session_id, seq, role, content)
+                            VALUES (?, ?, ?, ?);
+                        """, ((cur.lastrowid, seq, role, content) for seq, role, content in src.execute(
+                            "SELECT seq, role, content FROM session_messages WHERE session_id = ? ORDER BY seq;", (session_id,))))
+                        self._index_messages(dst, _scope((guild_id, user_id)), cur.lastrowid)
+                        moved += 1
+                    dst.executemany("""
+                        INSERT OR IGNORE INTO session_summaries (guild_id, user_id, session_name, summary, cursor)
+                        VALUES (?, ?, ?, ?, ?);
+                    """, src.execute("""
+                        SELECT guild_id, user_id, session_name, summary, cursor
+                        FROM session_summaries WHERE guild_id = ?;
+                    """, (guild_id,)).fetchall())
+                with mono.writer() as conn:
+                    conn.execute("DELETE FROM session_messages WHERE session_id IN (SELECT session_id FROM sessions WHERE guild_id = ?);", (guild_id,))
+                    conn.execute("DELETE FROM sessions WHERE guild_id = ?;", (guild_id,))
+                    conn.execute("DELETE FROM session_summaries WHERE guild_id = ?;", (guild_id,))
+        finally:
+            mono.close()
+        # Ids cached while migrating point into the monolith, not the shards
+        self._session_ids.clear()
+        self._persisted.clear()
+
+        if self._legacy:
+            self._legacy = False
+            logger.warning(f"[DB] Undecodable legacy rows remain in {self.db_path}; it is kept but not read in sharded mode")
+            return
+        done_path = self.db_path.with_name(self.db_path.name + ".split")
+        os.replace(self.db_path, done_path)
+        if guild_ids:
+            logger.info(f"[DB] Split {moved} sessions into shards; the old database is kept as {done_path}")
+
+    @contextmanager
+    def _db(self, guild_id):
+        """The database holding a guild's sessions: its shard, or the single database when not sharded."""
+        if self.shards is None:
+            yield self.db
+        else:
+            with self.shards.use(guild_id) as db:
+                yield db
+
+    def _all_dbs(self):
+        """Yields every database in turn, for queries that span guilds."""
+        if self.shards is None:
+            yield self.db
+            return
+        for guild_id in self.shards.known_ids():
+            with self.shards.use(guild_id) as db:
+                yield db
+
+    def _upgrade_to_integer_keys(self, conn, db_path: Path):
+        """
+        v1 -> v2: guild_id/user_id become INTEGER. SQLite cannot change a
+        column's type in place, so the two keyed tables are rebuilt; session_id
+        values are kept, so session_messages rows stay attached.
+        """
+        logger.info(f"[DB] Upgrading {db_path} to integer guild/user keys (schema v2)")
+        conn.execute(SESSIONS_SCHEMA.format(table="sessions_v2"))
+        conn.execute("""
+            INSERT INTO sessions_v2 (session_id, guild_id, user_id, session_name, message_count, updated_at)
+            SELECT session_id, CAST(guild_id AS INTEGER), CAST(user_id AS INTEGER), session_name, message_count, updated_at
+            FROM sessions;
+        """)
+        conn.execute("DROP TABLE sessions;")
+        conn.execute("ALTER TABLE sessions_v2 RENAME TO sessions;")
+
+        conn.execute(SUMMARIES_SCHEMA.format(table="session_summaries_v2"))
+        conn.execute("""
+            INSERT INTO session_summaries_v2 (guild_id, user_id, session_name, summary, cursor)
+            SELECT CAST(guild_id AS INTEGER), CAST(user_id AS INTEGER), session_name, summary, cursor
+            FROM session_summaries;
+        """)
+        conn.execute("DROP TABLE session_summaries;")
+        conn.execute("ALTER TABLE session_summaries_v2 RENAME TO session_summaries;")
+
+    def _build_search_index(self, conn, db_path: Path):
+        """v2 -> v3: indexes every message already stored."""
+        rows = conn.execute("""
+            SELECT m.message_id, s.guild_id, s.user_id, m.content
+            FROM session_messages m JOIN sessions s ON s.session_id = m.session_id;
+        """)
+        decode = self.codec.decode
+        indexed = conn.executemany("INSERT INTO session_fts (rowid, scope, content) VALUES (?, ?, ?);", (
+            (message_id, _scope((guild_id, user_id)), decode(content)) for message_id, guild_id, user_id, content in rows)).rowcount
+        if indexed:
+            logger.info(f"[DB] Built the search index for {indexed} messages in {db_path}")
+
+    @staticmethod
+    def _table_columns(conn, table: str) -> list[str]:
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({table});")]
+
+    def _migrate_legacy(self, db: SQLitePool):
+        """
+        Splits v0 JSON-blob rows into the sessions/session_messages tables, one
+        batch per transaction. Rows that cannot be decoded stay in
+        sessions_legacy and are still served by the compatibility read path.
+        """
+        migrated, skipped, last_rowid = 0, 0, 0
+        while True:
+            with db.writer() as conn:
+                rows = conn.execute("""
+                    SELECT rowid, guild_id, user_id, session_name, messages FROM sessions_legacy
+                    WHERE rowid > ? ORDER BY rowid LIMIT ?;
+                """, (last_rowid, MIGRATION_BATCH)).fetchall()
+                for rowid, guild_id, user_id, session_name, messages_json in rows:
+                    last_rowid = rowid
+                    try:
+                        messages = json.loads(messages_json)
+                    except json.JSONDecodeError:
+                        skipped += 1
+                        continue
+                    self._write_messages(conn, (str(guild_id), str(user_id), session_name), messages)
+                    conn.execute("DELETE FROM sessions_legacy WHERE rowid = ?;", (rowid,))
+                    migrated += 1
+            if len(rows) < MIGRATION_BATCH:
+                break
+
+        with db.writer() as conn:
+            if not skipped:
+                conn.execute("DROP TABLE sessions_legacy;")
+                self._legacy = False
+        self._persisted.clear()
+        logger.info(f"[DB] Migrated {migrated} legacy sessions ({skipped} undecodable rows left in sessions_legacy)")
+
+    def close(self):
+        with self._changed:
+            self._closing = True
+            self._changed.notify()
+        self._flusher.join(timeout=5)
+        self.flush()
+        if self.journal is not None:
+            self._checkpoint(force=True)
+            self.journal.close()
+        if self.shards is not None:
+            self.shards.close()
+        else:
+            self.db.close()
+
+    def _mark_dirty(self, key: tuple):
+        with self._changed:
+            now = time.monotonic()
+            if not self._dirty:
+                self._dirty_since = now
+            self._dirty.add(key)
+            self._last_change = now
+            self._changed.notify()
+
+    def _flush_loop(self):
+        while True:
+            with self._changed:
+                while not self._dirty and not self._closing:
+                    self._changed.wait()
+                if self._closing:
+                    return
+                due = min(self._last_change + self.flush_interval, self._dirty_since + self.max_staleness)
+                delay = due - time.monotonic()
+                if delay > 0 and not self._checkpoint_due:
+                    self._changed.wait(delay)
+                    continue
+                self._checkpoint_due = False
+            try:
+                self.flush()
+                self._checkpoint()
+            except Exception as e:
+                logger.error(f"[SYNC] Background flush failed: {e}", exc_info=True)
+
+    def flush(self) -> int:
+        """Writes every dirty session, one transaction per database file. Returns how many sessions were written."""
+        with self._flush_lock:
+            with self._changed:
+                if not self._dirty:
+                    return 0
+                batch = [(key, self._cached(key)) for key in self._dirty]
+                self._dirty.clear()
+                self._dirty_since = None
+
+            groups = {}  # {guild_id or None: [(key, messages)]}
+            for key, messages in batch:
+                groups.setdefault(key[0] if self.shards is not None else None, []).append((key, messages))
+
+            written = 0
+            for guild_id, group in groups.items():
+                try:
+                    with self._db(guild_id) as db, db.writer() as conn:
+                        for key, messages in group:
+                            if messages is None:
+                                continue  # deleted after it was marked dirty
+                            if not all(isinstance(m, dict) and "role" in m and "content" in m for m in messages):
+                                logger.warning(f"[SYNC] Skipping malformed session '{key[2]}' for user {key[1]} in guild {key[0]}")
+                                continue
+                            self._write_messages(conn, key, messages)
+                            written += 1
+                    with self._changed:
+                        for key, _ in group:
+                            self._pending_writeback.pop(key, None)
+                except sqlite3.Error as e:
+                    logger.error(f"[SYNC] Failed to flush {len(group)} sessions: {e}", exc_info=True)
+                    for key, _ in group:
+                        self._forget(key)  # rolled back, so the cached ids/history are ahead of the DB
+                        self._mark_dirty(key)
+
+        logger.debug(f"[SYNC] Flushed {written} dirty sessions")
+        return written
+
+    def _journal(self, record: dict):
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(record)
+        except (OSError, ValueError) as e:
+            logger.error(f"[JOURNAL] Could not journal a '{record['op']}' of session '{record['k'][2]}': {e}", exc_info=True)
+            return
+        if self.journal.size() >= self.journal_checkpoint_bytes:
+            # Replay time grows with the journal; have the flusher catch the DB up and cut it back
+            with self._changed:
+                self._checkpoint_due = True
+                self._changed.notify()
+
+    def _journal_snapshot(self) -> list[dict]:
+        """
+        What a fresh journal must hold: the full history of every session the
+        DB is behind on, including evicted ones whose write-back has not
+        committed yet (they are off _dirty by then).
+        """
+        with self._changed:
+            keys = set(self._dirty) | set(self._pending_writeback)
+        records = []
+        for key in keys:
+            messages = self._cached(key)
+            if messages is not None:
+                records.append({"op": "set", "k": list(key), "m": messages})
+        return records
+
+    def _checkpoint(self, force: bool = False):
+        """Rewrites the journal down to a snapshot once it outgrows journal_checkpoint_bytes."""
+        if self.journal is None:
+            return
+        with self._flush_lock:  # a flush in progress has taken sessions off _dirty but not written them yet
+            if not force and self.journal.size() < self.journal_checkpoint_bytes:
+                return
+            size = self.journal.checkpoint(self._journal_snapshot)
+        logger.debug(f"[JOURNAL] Checkpointed {self.journal.path} down to {size} bytes")
+
+    def _replay_journal(self):
+        """Applies the journal on top of the DB after a crash, then checkpoints it empty."""
+        started = time.monotonic()
+        records = self.journal.read()
+        state = {}  # {key: messages, or None once deleted}
+        gaps = set()  # keys whose appends had no base; fine if a later set/del supersedes them
+        for record in records:
+            key = tuple(record["k"])
+            if record["op"] == "set":
+                state[key] = record["m"]
+                gaps.discard(key)
+            elif record["op"] == "append":
+                if key in gaps:
+                    continue
+                base = state[key] if key in state else (self._load_session_from_db(*key) if record["from"] else [])
+                if base is None or len(base) < record["from"]:
+                    gaps.add(key)
+                    state.pop(key, None)
+                    continue
+                state[key] = base[:record["from"]] + record["m"]
+            elif record["op"] == "del":
+                state[key] = None
+                gaps.discard(key)
+        for key in gaps:
+            logger.warning(f"[JOURNAL] Could not replay session '{key[2]}' of user {key[1]} in guild {key[0]}: its base history is missing")
+
+        for key, messages in state.items():
+            if messages is None:
+                self.delete_session(*key)
+            else:
+                self.temp_sessions.put(key, messages)
+                self._mark_dirty(key)
+        written = self.flush()
+        self._checkpoint(force=True)
+        if records:
+            logger.info(f"[JOURNAL] Replayed {len(records)} records into {written} sessions in {(time.monotonic() - started) * 1000:.0f} ms")
+
+    def _cached(self, key: tuple) -> List[Dict[str, str]] | None:
+        messages = self.temp_sessions.peek(key)
+        return messages if messages is not None else self._pending_writeback.get(key)
+
+    def _write_back(self, key: tuple, messages: List[Dict[str, str]]):
+        """
+        Eviction hook of the session cache, called before the entry leaves it:
+        persists the session if it is dirty, then drops our copies. Taking it
+        off _dirty and parking it in _pending_writeback happen together, so a
+        concurrent flush never mistakes it for deleted, and it stays there
+        until the DB write has committed.
+        """
+        with self._changed:
+            dirty = key in self._dirty
+            if dirty:
+                self._dirty.discard(key)
+                self._pending_writeback[key] = messages
+        if dirty:
+            with self._flush_lock:
+                try:
+                    with self._db(key[0]) as db, db.writer() as conn:
+                        self._write_messages(conn, key, messages)
+                except sqlite3.Error as e:
+                    logger.error(f"[SYNC] Write-back of evicted session '{key[2]}' failed, retrying with the next flush: {e}", exc_info=True)
+                    self._forget(key)
+                    self._mark_dirty(key)
+                    return
+                with self._changed:
+                    self._pending_writeback.pop(key, None)
+        self._forget(key)
+
+    def _session_id(self, conn, key: tuple, create: bool = False) -> int | None:
+        session_id = self._session_ids.get(key)
+        if session_id is not None:
+            return session_id
+        row = conn.execute(SQL_SESSION_ID, _db_key(key)).fetchone()
+        if row:
+            session_id = row[0]
+        elif create:
+            session_id = conn.execute("""
+                INSERT INTO sessions (guild_id, user_id, session_name, message_count, updated_at)
+                VALUES (?, ?, ?, 0, ?);
+            """, _db_key(key) + (time.time(),)).lastrowid
+            self._persisted[key] = []
+        else:
+            return None
+        self._session_ids[key] = session_id
+        return session_id
+
+    def _write_messages(self, conn, key: tuple, messages: List[Dict[str, str]]) -> int:
+        """
+        Persists `messages` as the full history of a session. When it only
+        extends what is already stored (the normal /talk turn) just the new
+        rows are inserted; anything else rewrites the session's rows.
+        Returns the number of message rows written.
+        """
+        session_id = self._session_id(conn, key, create=True)
+        if self._legacy:
+            # Writing a session that was served from the legacy table migrates it
+            conn.execute("""
+                DELETE FROM sessions_legacy
                 WHERE guild_id = ? AND user_id = ? AND session_name = ?;
-            """, (str(guild_id), str(user_id), session_name))
-            row = cursor.fetchone()
-            if row:
-                messages_json = row[0]
-                messages = json.loads(messages_json)
+            """, key)
+        previous = self._persisted.get(key)
+        if previous is not None and len(previous) <= len(messages) and messages[:len(previous)] == previous:
+            start = len(previous)
+        else:
+            self._unindex_session(conn, session_id, _scope(key))
+            conn.execute("DELETE FROM session_messages WHERE session_id = ?;", (session_id,))
+            start = 0
+
+        encode = self.codec.encode
+        new_rows = [(session_id, seq, m["role"], encode(m["content"])) for seq, m in enumerate(messages[start:], start)]
+        if new_rows:
+            conn.executemany("""
+                INSERT INTO session_messages (session_id, seq, role, content)
+                VALUES (?, ?, ?, ?);
+            """, new_rows)
+            self._index_messages(conn, _scope(key), session_id, start)
+        if new_rows or previous is None or len(previous) != len(messages):
+            conn.execute("""
+                UPDATE sessions SET message_count = ?, updated_at = ?
+                WHERE session_id = ?;
+            """, (len(messages), time.time(), session_id))
+        self._persisted[key] = list(messages)
+        return len(new_rows)
+
+    def _index_messages(self, conn, scope: str, session_id: int, start: int = 0):
+        """Adds a session's messages from seq `start` on to the search index."""
+        rows = conn.execute("SELECT message_id, content FROM session_messages WHERE session_id = ? AND seq >= ?;", (session_id, start))
+        decode = self.codec.decode
+        conn.executemany("INSERT INTO session_fts (rowid, scope, content) VALUES (?, ?, ?);", (
+            (message_id, scope, decode(content)) for message_id, content in rows))
+
+    def _unindex_session(self, conn, session_id: int, scope: str):
+        """Removes a session's messages from the search index; call before deleting the rows."""
+        # A contentless index can only drop a row given the exact values it indexed
+        rows = conn.execute("SELECT message_id, content FROM session_messages WHERE session_id = ?;", (session_id,))
+        decode = self.codec.decode
+        conn.executemany("INSERT INTO session_fts (session_fts, rowid, scope, content) VALUES ('delete', ?, ?, ?);", (
+            (message_id, scope, decode(content)) for message_id, content in rows))
+
+    def _read_messages(self, conn, session_id: int) -> List[Dict[str, str]]:
+        rows = conn.execute(SQL_READ_MESSAGES, (session_id,)).fetchall()
+        decode = self.codec.decode
+        return [{"role": role, "content": decode(content)} for role, content in rows]
+
+    def _load_legacy_session(self, key: tuple) -> List[Dict[str, str]] | None:
+        """Compatibility read path for sessions still stored as a v0 JSON blob."""
+        with self.db.reader() as conn:
+            row = conn.execute("""
+                SELECT messages FROM sessions_legacy
+                WHERE guild_id = ? AND user_id = ? AND session_name = ?;
+            """, key).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _load_session_from_db(self, guild_id: str, user_id: str, session_name: str) -> List[Dict[str, str]] | None:
+        key = (str(guild_id), str(user_id), session_name)
+        try:
+            with self._db(guild_id) as db, db.reader() as conn:
+                session_id = self._session_id(conn, key)
+                messages = self._read_messages(conn, session_id) if session_id is not None else None
+            if messages is None and self._legacy:
+                messages = self._load_legacy_session(key)
+            if messages is not None:
+                if session_id is not None:
+                    self._persisted[key] = list(messages)
                 logger.info(f"[AI] Loaded session '{session_name}' for user {user_id} from DB")
                 return messages
             else:
@@ -67,38 +772,22 @@ class SessionManager:
         except (sqlite3.Error, json.JSONDecodeError) as e:
             logger.error(f"[ERROR] Failed to load or decode session '{session_name}' from DB: {e}", exc_info=True)
             return None
-        finally:
-            conn.close()
-
-    def _save_session_to_db(self, guild_id: str, user_id: str, session_name: str, messages: List[Dict[str, str]]):
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-        try:
-            messages_json = json.dumps(messages)
-            cursor.execute("""
-                INSERT OR REPLACE INTO sessions (guild_id, user_id, session_name, messages)
-                VALUES (?, ?, ?, ?);
-            """, (str(guild_id), str(user_id), session_name, messages_json))
-            conn.commit()
-            logger.info(f"[AI] Saved/Updated session '{session_name}' for user {user_id} in guild {guild_id} to DB")
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"[ERROR] Failed to save session '{session_name}' to DB: {e}", exc_info=True)
-            return False
-        finally:
-            conn.close()
 
     def _store_temp(self, guild_id: str, user_id: str, session_name: str, messages: List[Dict[str, str]]):
-        self.temp_sessions.setdefault(str(guild_id), {}).setdefault(str(user_id), {})[session_name] = messages
+        self.temp_sessions.put((str(guild_id), str(user_id), session_name), messages)
         logger.debug(f"[DEBUG] Stored session '{session_name}' in temp for user {user_id} in guild {guild_id} (messages count: {len(messages)})")
 
     def get_current_session(self, guild_id: str, user_id: str, session_name: str) -> List[Dict[str, str]]:
-        session = self.temp_sessions.get(str(guild_id), {}).get(str(user_id), {}).get(session_name, None)
+        session = self.temp_sessions.get((str(guild_id), str(user_id), session_name))
+        if session is None:
+            session = self._pending_writeback.get((str(guild_id), str(user_id), session_name))
         if session is not None:
             logger.debug(f"[DEBUG] Retrieved current session '{session_name}' from temp for user {user_id} in guild {guild_id} (messages count: {len(session)})")
             return session
         else:
             db_messages = self._load_session_from_db(guild_id, user_id, session_name)
+            if db_messages is None and self.archive is not None:
+                db_messages = self._restore_archived(guild_id, user_id, session_name)
             if db_messages is not None:
                 self._store_temp(guild_id, user_id, session_name, db_messages)
                 return db_messages
@@ -106,28 +795,39 @@ class SessionManager:
                 return []
 
     def update_session(self, guild_id: str, user_id: str, session_name: str, messages: List[Dict[str, str]]):
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT OR REPLACE INTO sessions
-                    (guild_id, user_id, session_name, messages)
-                    VALUES (?, ?, ?, ?);
-                """, (str(guild_id), str(user_id), session_name, json.dumps(messages)))
-                conn.commit()
-            self._store_temp(guild_id, user_id, session_name, messages)
-            logger.info(f"[AI] Updated session '{session_name}' for user {user_id} in guild {guild_id}")
-            return True
-        except sqlite3.Error as e:
-            logger.error(f"[ERROR] Failed to update session '{session_name}' for user {user_id} in guild {guild_id}: {e}", exc_info=True)
-            return False
+        key = (str(guild_id), str(user_id), session_name)
+        if self.journal is not None:
+            # A normal turn only extends the history, so only the new messages are journaled
+            previous = self._cached(key)
+            if previous is not None and previous is not messages and len(previous) <= len(messages) and messages[:len(previous)] == previous:
+                record = {"op": "append", "k": list(key), "from": len(previous), "m": messages[len(previous):]}
+            else:
+                record = {"op": "set", "k": list(key), "m": messages}
+        self._store_temp(guild_id, user_id, session_name, messages)
+        self._mark_dirty(key)
+        if self.journal is not None:
+            # Journaled after the cache changed, so a checkpoint in between snapshots the new history
+            self._journal(record)
+        if not messages:
+            self.clear_summary(guild_id, user_id, session_name)
+        logger.info(f"[AI] Updated session '{session_name}' for user {user_id} in guild {guild_id}")
+        return True
+
+    def _forget(self, key: tuple):
+        self._session_ids.pop(key, None)
+        self._persisted.pop(key, None)
 
     def export_user_session(self, user_id: int, session_name: str) -> dict:
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT messages FROM sessions WHERE user_id = ? AND session_name = ?", (user_id, session_name))
-        row = c.fetchone()
-        conn.close()
+        self.flush()
+        for db in self._all_dbs():
+            with db.reader() as conn:
+                row = conn.execute(SQL_USER_SESSION_BY_NAME, (int(user_id), session_name)).fetchone()
+                if row:
+                    return self._read_messages(conn, row[0])
+        if not self._legacy:
+            return None
+        with self.db.reader() as conn:
+            row = conn.execute("SELECT messages FROM sessions_legacy WHERE user_id = ? AND session_name = ?", (str(user_id), session_name)).fetchone()
 
         if not row:
             return None
@@ -140,25 +840,87 @@ class SessionManager:
         return content
 
     def export_all_sessions(self) -> dict:
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT guild_id, user_id, session_name, messages FROM sessions")
-        rows = c.fetchall()
-        conn.close()
-
+        self.flush()
         export_data = {}
-        for guild_id, user_id, session_name, content in rows:
-            export_data.setdefault(str(guild_id), {}).setdefault(str(user_id), {})[session_name] = content
+        for db in self._all_dbs():
+            with db.reader() as conn:
+                sessions = conn.execute("SELECT session_id, guild_id, user_id, session_name FROM sessions").fetchall()
+                for session_id, guild_id, user_id, session_name in sessions:
+                    export_data.setdefault(str(guild_id), {}).setdefault(str(user_id), {})[session_name] = self._read_messages(conn, session_id)
+        if self._legacy:
+            with self.db.reader() as conn:
+                for guild_id, user_id, session_name, content in conn.execute("SELECT guild_id, user_id, session_name, messages FROM sessions_legacy"):
+                    export_data.setdefault(str(guild_id), {}).setdefault(str(user_id), {})[session_name] = content
+        if self.archive is not None:
+            for guild_id in self.archive.guild_ids():
+                for user_id, session_name, messages in self.archive.sessions(guild_id):
+                    export_data.setdefault(str(guild_id), {}).setdefault(str(user_id), {}).setdefault(session_name, messages)
         return export_data
 
 
+    def iter_all_sessions(self, batch_size: int = 200, skipped: list | None = None):
+        """
+        Yields (guild_id, user_id, session_name, messages) for every stored
+        session, hot then legacy then archived, like export_all_sessions but
+        without holding them all: sessions are paged by session_id, and a
+        reader is only borrowed for one batch at a time. Archived sessions
+        that cannot be read are appended to `skipped`. Call flush() first.
+        """
+        hot = set()
+        for db in self._all_dbs():
+            last_id = 0
+            while True:
+                with db.reader() as conn:
+                    rows = conn.execute(SQL_SESSIONS_PAGE, (last_id, batch_size)).fetchall()
+                    batch = [(guild_id, user_id, session_name, self._read_messages(conn, session_id))
+                             for session_id, guild_id, user_id, session_name in rows]
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                for guild_id, user_id, session_name, messages in batch:
+                    hot.add((guild_id, user_id, session_name))
+                    yield guild_id, user_id, session_name, messages
+        if self._legacy:
+            with self.db.reader() as conn:
+                legacy = conn.execute("SELECT guild_id, user_id, session_name, messages FROM sessions_legacy").fetchall()
+            for guild_id, user_id, session_name, content in legacy:
+                if (int(guild_id), int(user_id), session_name) not in hot:
+                    yield guild_id, user_id, session_name, content
+        if self.archive is not None:
+            for guild_id in self.archive.guild_ids():
+                for user_id, session_name, messages in self.archive.sessions(guild_id, skipped=skipped):
+                    if (guild_id, user_id, session_name) not in hot:
+                        yield guild_id, user_id, session_name, messages
+
+    def export_sessions_for_user(self, user_id) -> Dict[str, Any]:
+        """{session_name: messages} for every session the user has, across guilds."""
+        self.flush()
+        export_data = {}
+        for db in self._all_dbs():
+            with db.reader() as conn:
+                sessions = conn.execute(SQL_USER_SESSIONS, (int(user_id),)).fetchall()
+                for session_id, session_name in sessions:
+                    export_data[session_name] = self._read_messages(conn, session_id)
+        if self._legacy:
+            with self.db.reader() as conn:
+                for session_name, content in conn.execute("SELECT session_name, messages FROM sessions_legacy WHERE user_id = ?", (str(user_id),)):
+                    export_data.setdefault(session_name, content)
+        if self.archive is not None:
+            for guild_id in self.archive.guild_ids():
+                for _, session_name, messages in self.archive.sessions(guild_id, user_id):
+                    export_data.setdefault(session_name, messages)
+        return export_data
+
     def get_all_sessions_for_user(self, user_id: int) -> List[str]:
+        self.flush()
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT session_name FROM sessions WHERE user_id = ?", (user_id,))
-            rows = cursor.fetchall()
-            conn.close()
+            rows = []
+            for db in self._all_dbs():
+                with db.reader() as conn:
+                    rows += [(name,) for _, name in conn.execute(SQL_USER_SESSIONS, (int(user_id),))]
+            if self._legacy:
+                with self.db.reader() as conn:
+                    rows += conn.execute("SELECT session_name FROM sessions_legacy WHERE user_id = ?", (str(user_id),)).fetchall()
 
             session_names = [row[0] for row in rows]
             logger.debug(f"[SessionManager] Found {len(session_names)} sessions for user {user_id}")
@@ -170,65 +932,288 @@ class SessionManager:
 
 
     def list_sessions(self, guild_id: str, user_id: str) -> List[str]:
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute("""
-                SELECT session_name FROM sessions
-                WHERE guild_id = ? AND user_id = ?;
-            """, (str(guild_id), str(user_id)))
-            sessions = [row[0] for row in cursor.fetchall()]
-            return sessions
+        try:
+            with self._db(guild_id) as db, db.reader() as conn:
+                rows = conn.execute(SQL_USER_GUILD_NAMES, (int(guild_id), int(user_id))).fetchall()
+                if self._legacy:
+                    rows += conn.execute("""
+                        SELECT session_name FROM sessions_legacy
+                        WHERE guild_id = ? AND user_id = ?;
+                    """, (str(guild_id), str(user_id))).fetchall()
+            names = [row[0] for row in rows]
+            # Sessions created since the last flush exist only in the cache so far
+            names += [name for name in self.temp_sessions.names_for(str(guild_id), str(user_id)) if name not in names]
+            return names
         except sqlite3.Error as e:
             logger.error(f"[ERROR] Failed to list sessions for user {user_id} in guild {guild_id}: {e}", exc_info=True)
             return []
-        finally:
-            conn.close()
 
-    def delete_session(self, guild_id: str, user_id: str, session_name: str):
+    def list_guild_sessions(self, guild_id) -> List[tuple]:
+        """(user_id, session_name, message_count, updated_at) for every session stored for a guild."""
+        self.flush()
         try:
-            if str(guild_id) in self.temp_sessions and \
-               str(user_id) in self.temp_sessions[str(guild_id)] and \
-               session_name in self.temp_sessions[str(guild_id)][str(user_id)]:
-                del self.temp_sessions[str(guild_id)][str(user_id)][session_name]
-                logger.info(f"[AI] Deleted session '{session_name}' from temp for user {user_id} in guild {guild_id}")
-        except KeyError:
-            logger.debug(f"[DEBUG] Session '{session_name}' not found in temp for deletion due to missing keys.")
+            with self._db(guild_id) as db, db.reader() as conn:
+                return conn.execute(SQL_GUILD_SESSIONS, (int(guild_id),)).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"[ERROR] Failed to list sessions for guild {guild_id}: {e}", exc_info=True)
+            return []
 
-        conn = self._get_db_connection()
-        cursor = conn.cursor()
+    def list_all_sessions(self) -> List[tuple]:
+        """(guild_id, user_id, session_name) for every stored session; used by admin listings."""
+        self.flush()
         try:
-            cursor.execute("""
-                DELETE FROM sessions
-                WHERE guild_id = ? AND user_id = ? AND session_name = ?;
-            """, (str(guild_id), str(user_id), session_name))
-            conn.commit()
+            rows = []
+            for db in self._all_dbs():
+                with db.reader() as conn:
+                    rows += conn.execute("SELECT guild_id, user_id, session_name FROM sessions").fetchall()
+            if self._legacy:
+                with self.db.reader() as conn:
+                    rows += conn.execute("SELECT guild_id, user_id, session_name FROM sessions_legacy").fetchall()
+            return rows
+        except sqlite3.Error as e:
+            logger.error(f"[ERROR] Failed to list all sessions: {e}", exc_info=True)
+            return []
+
+    def search_messages(self, guild_id, user_id, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Best-matching messages across one user's sessions in a guild, as
+        {session_name, seq, role, snippet} dicts in rank order.
+        """
+        match = _fts_query(query)
+        if match is None:
+            return []
+        self.flush()  # so the latest turns are searchable
+        key = (str(guild_id), str(user_id))
+        try:
+            with self._db(guild_id) as db, db.reader() as conn:
+                ranked = conn.execute(SQL_SEARCH, (f"scope : {_scope(key)} AND ({match})", limit)).fetchall()
+                if not ranked:
+                    return []
+                ids = [message_id for message_id, _ in ranked]
+                hits = {row[0]: row[1:] for row in conn.execute(SQL_SEARCH_HITS.format(marks=", ".join("?" * len(ids))), ids)}
+        except sqlite3.Error as e:
+            logger.error(f"[ERROR] Search for user {user_id} in guild {guild_id} failed: {e}", exc_info=True)
+            return []
+
+        terms = query.split()
+        results = []
+        for message_id in ids:
+            if message_id not in hits:
+                continue
+            session_name, seq, role, content = hits[message_id]
+            results.append({"session_name": session_name, "seq": seq, "role": role,
+                            "snippet": make_snippet(self.codec.decode(content), terms)})
+        return results
+
+    def list_archived_sessions(self, guild_id, user_id) -> List[str]:
+        """Names of the user's sessions in this guild that sit in the archive, newest first."""
+        if self.archive is None:
+            return []
+        hot = set(self.list_sessions(guild_id, user_id))
+        return [name for name in self.archive.names_for(guild_id, user_id) if name not in hot]
+
+    def retention_candidates(self, guild_id, idle_days: float = 0, max_bytes: int = 0, busy=()) -> List[tuple]:
+        """
+        (user_id, session_name) of the sessions a guild's retention policy moves
+        to the archive: every session idle for more than `idle_days`, then the
+        least recently updated ones until the guild's stored content fits in
+        `max_bytes`. A zero disables that part of the policy. Keys in `busy`
+        (sessions with a reply in flight) are passed over.
+        """
+        self.flush()
+        try:
+            with self._db(guild_id) as db, db.reader() as conn:
+                rows = conn.execute(SQL_RETENTION_SIZES, (int(guild_id),)).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"[ERROR] Failed to size sessions of guild {guild_id} for retention: {e}", exc_info=True)
+            return []
+
+        cutoff = time.time() - idle_days * 86400 if idle_days else None
+        total = sum(row[3] for row in rows)
+        chosen = []
+        for user_id, session_name, updated_at, size in rows:
+            idle = cutoff is not None and updated_at < cutoff
+            over = bool(max_bytes) and total > max_bytes
+            if not idle and not over:
+                break  # oldest first, so nothing later is idle or needed to get under max_bytes
+            if self._in_use((str(guild_id), str(user_id), session_name), busy):
+                continue
+            chosen.append((user_id, session_name))
+            total -= size
+        return chosen
+
+    def _in_use(self, key: tuple, busy=()) -> bool:
+        # A clean cached copy is no reason to stay hot; archiving drops it along with the rows
+        return key in busy or key in self._dirty or key in self._pending_writeback
+
+    def archive_sessions(self, guild_id, sessions: List[tuple], busy=()) -> int:
+        """
+        Moves (user_id, session_name) sessions from the hot tables to the
+        guild's archive, skipping unsaved ones and keys in `busy`. Returns how
+        many moved.
+        """
+        if self.archive is None:
+            return 0
+        batch = []
+        with self._db(guild_id) as db, db.reader() as conn:
+            for user_id, session_name in sessions:
+                key = (str(guild_id), str(user_id), session_name)
+                if self._in_use(key, busy):
+                    continue  # picked up again since it was chosen
+                row = conn.execute("SELECT session_id, updated_at FROM sessions WHERE guild_id = ? AND user_id = ? AND session_name = ?;", _db_key(key)).fetchone()
+                if row is None:
+                    continue
+                pinned = self.get_summary(*key)
+                batch.append({"user_id": user_id, "name": session_name, "messages": self._read_messages(conn, row[0]),
+                              "updated_at": row[1], "summary": pinned[0] if pinned else None, "cursor": pinned[1] if pinned else None})
+        stored = self.archive.add(guild_id, batch)
+        # Only once the archive copy is durable does the hot copy go
+        for session in batch:
+            with self._flush_lock:
+                self._delete_session(guild_id, session["user_id"], session["name"])
+            self.clear_summary(guild_id, session["user_id"], session["name"])
+        if batch:
+            logger.info(f"[ARCHIVE] Archived {len(batch)} sessions of guild {guild_id} ({stored / 1024:.0f} KB compressed)")
+        return len(batch)
+
+    def _restore_archived(self, guild_id, user_id, session_name: str) -> List[Dict[str, str]] | None:
+        """Brings an archived session back into the hot tier (journaled and written like any update)."""
+        entry = self.archive.load(guild_id, user_id, session_name)
+        if entry is None:
+            return None
+        self.update_session(guild_id, user_id, session_name, entry["messages"])
+        if entry["summary"] is not None:
+            self.set_summary(guild_id, user_id, session_name, entry["summary"], entry["cursor"])
+        # The archive copy may only go once the hot one survives a crash: fsynced in the journal, or written to the DB
+        if self.journal is not None:
+            self.journal.sync()
+        else:
+            self.flush()
+        self.archive.remove(guild_id, user_id, session_name)
+        logger.info(f"[ARCHIVE] Restored session '{session_name}' for user {user_id} in guild {guild_id} ({len(entry['messages'])} messages)")
+        return entry["messages"]
+
+    def compact_archive(self, guild_id) -> int:
+        return self.archive.compact(guild_id) if self.archive is not None else 0
+
+    def archive_stats(self, guild_id) -> dict | None:
+        return self.archive.stats(guild_id) if self.archive is not None else None
+
+    def delete_session(self, guild_id: str, user_id: str, session_name: str):
+        with self._flush_lock:
+            self._delete_session(guild_id, user_id, session_name)
+        self.clear_summary(guild_id, user_id, session_name)
+        if self.archive is not None:
+            self.archive.remove(guild_id, user_id, session_name)  # a stale cold copy must not come back
+
+    def _delete_session(self, guild_id: str, user_id: str, session_name: str):
+        key = (str(guild_id), str(user_id), session_name)
+        self._journal({"op": "del", "k": list(key)})
+        with self._changed:
+            self._dirty.discard(key)
+        self._pending_writeback.pop(key, None)
+        if self.temp_sessions.pop(key) is not None:
+            logger.info(f"[AI] Deleted session '{session_name}' from temp for user {user_id} in guild {guild_id}")
+
+        try:
+            with self._db(guild_id) as db, db.writer() as conn:
+                session_id = self._session_id(conn, key)
+                if session_id is not None:
+                    self._unindex_session(conn, session_id, _scope(key))
+                    conn.execute("DELETE FROM session_messages WHERE session_id = ?;", (session_id,))
+                    conn.execute("DELETE FROM sessions WHERE session_id = ?;", (session_id,))
+                if self._legacy:
+                    conn.execute("""
+                        DELETE FROM sessions_legacy
+                        WHERE guild_id = ? AND user_id = ? AND session_name = ?;
+                    """, key)
         except sqlite3.Error as e:
             logger.error(f"[ERROR] Failed to delete session '{session_name}' from DB: {e}", exc_info=True)
-        finally:
-            conn.close()
+        self._forget(key)
+
+    def get_summary(self, guild_id: str, user_id: str, session_name: str) -> tuple[str, int] | None:
+        """Returns the pinned (summary, cursor) for a session; messages before cursor are covered by the summary."""
+        key = (str(guild_id), str(user_id), session_name)
+        if key in self.summaries:
+            return self.summaries[key]
+
+        try:
+            with self._db(guild_id) as db, db.reader() as conn:
+                row = conn.execute("""
+                    SELECT summary, cursor FROM session_summaries
+                    WHERE guild_id = ? AND user_id = ? AND session_name = ?;
+                """, _db_key(key)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"[ERROR] Failed to load summary for session '{session_name}': {e}", exc_info=True)
+            return None
+
+        self.summaries[key] = (row[0], row[1]) if row else None
+        return self.summaries[key]
+
+    def set_summary(self, guild_id: str, user_id: str, session_name: str, summary: str, cursor: int,
+                    basis: List[Dict[str, str]] | None = None) -> bool:
+        """
+        Pins (summary, cursor) on a session. With `basis`, the history the
+        summary was computed from, it is only pinned if the session still
+        starts with basis[:cursor]; a session cleared, deleted or rewritten
+        while the summary was being made keeps no stale summary. Returns
+        whether it was pinned.
+        """
+        key = (str(guild_id), str(user_id), session_name)
+        if basis is not None:
+            current = self._cached(key)
+            if current is None:
+                current = self._load_session_from_db(guild_id, user_id, session_name)
+            if current is None or len(current) < cursor or current[:cursor] != basis[:cursor]:
+                logger.info(f"[AI] Dropped a stale summary for session '{session_name}' of user {user_id}; it changed while being summarized")
+                return False
+        try:
+            with self._db(guild_id) as db, db.writer() as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO session_summaries
+                    (guild_id, user_id, session_name, summary, cursor)
+                    VALUES (?, ?, ?, ?, ?);
+                """, _db_key(key) + (summary, cursor))
+            self.summaries[key] = (summary, cursor)
+            logger.info(f"[AI] Pinned summary for session '{session_name}' of user {user_id} up to message {cursor}")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"[ERROR] Failed to save summary for session '{session_name}': {e}", exc_info=True)
+            return False
+
+    def clear_summary(self, guild_id: str, user_id: str, session_name: str):
+        key = (str(guild_id), str(user_id), session_name)
+        self.summaries.pop(key, None)
+        try:
+            with self._db(guild_id) as db, db.writer() as conn:
+                conn.execute("""
+                    DELETE FROM session_summaries
+                    WHERE guild_id = ? AND user_id = ? AND session_name = ?;
+                """, _db_key(key))
+        except sqlite3.Error as e:
+            logger.error(f"[ERROR] Failed to clear summary for session '{session_name}': {e}", exc_info=True)
 
     def filter_and_sync_sessions(self):
-        logger.info("[SYNC] Filtering and syncing all temp sessions to DB...")
-        for guild_id, users in list(self.temp_sessions.items()):
-            for user_id, sessions in list(users.items()):
-                for session_name, messages in list(sessions.items()):
-                    if isinstance(messages, list) and all('role' in m and 'content' in m for m in messages):
-                        if messages:
-                            self._save_session_to_db(guild_id, user_id, session_name, messages)
-                        else:
-                            del self.temp_sessions[guild_id][user_id][session_name]
-                            if not self.temp_sessions[guild_id][user_id]:
-                                del self.temp_sessions[guild_id][user_id]
-                            if not self.temp_sessions[guild_id]:
-                                del self.temp_sessions[guild_id]
-                    else:
-                        del self.temp_sessions[guild_id][user_id][session_name]
-                        if not self.temp_sessions[guild_id][user_id]:
-                            del self.temp_sessions[guild_id][user_id]
-                        if not self.temp_sessions[guild_id]:
-                            del self.temp_sessions[guild_id]
-        logger.info("[SYNC] Filtering and sync completed.")
+        """Flushes dirty sessions now, then drops empty or malformed entries from the cache."""
+        logger.info("[SYNC] Filtering and syncing dirty temp sessions to DB...")
+        written = self.flush()
+        for key in self.temp_sessions.keys():
+            if key in self._dirty:
+                continue
+            messages = self.temp_sessions.peek(key)
+            valid = isinstance(messages, list) and all('role' in m and 'content' in m for m in messages)
+            if not valid or not messages:
+                self.temp_sessions.pop(key)
+                self._forget(key)
+        logger.info(f"[SYNC] Filtering and sync completed ({written} sessions written).")
+
+    def cache_stats(self) -> dict:
+        stats = self.temp_sessions.stats()
+        stats["dirty"] = len(self._dirty)
+        stats["compression"] = self.codec.stats()
+        stats["shards"] = self.shards.stats() if self.shards is not None else None
+        stats["journal_bytes"] = self.journal.size() if self.journal is not None else None
+        return stats
 
     def flush_all_to_disk(self):
         logger.info("[AI] Flushing all temp sessions to disk on shutdown (via sync).")
@@ -0,0 +1,141 @@
+#core/session_service.py
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+
+class AsyncSessionService:
+    """
+    Async front for SessionManager.
+
+    Every call is queued to one dedicated DB thread and runs there in
+    submission order, so sqlite3, JSON work and cache upkeep never run on the
+    event loop, and an update is always visible to the reads queued after it.
+    Cogs only ever talk to this object, never to the manager directly.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-db")
+
+    @property
+    def db_path(self):
+        return self.manager.db_path
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _durable(self):
+        """Waits until the journal covers every change made so far (group commit); the syncer wakes us, no thread is held."""
+        journal = self.manager.journal
+        if journal is not None and journal.durable_lsn < journal.written_lsn:
+            await journal.durable_future(journal.written_lsn)
+
+    async def get(self, guild_id, user_id, session_name: str) -> list[dict]:
+        return await self._run(self.manager.get_current_session, guild_id, user_id, session_name)
+
+    async def update(self, guild_id, user_id, session_name: str, messages: list[dict]) -> bool:
+        result = await self._run(self.manager.update_session, guild_id, user_id, session_name, messages)
+        await self._durable()
+        return result
+
+    async def delete(self, guild_id, user_id, session_name: str):
+        await self._run(self.manager.delete_session, guild_id, user_id, session_name)
+        await self._durable()
+
+    async def list_sessions(self, guild_id, user_id) -> list[str]:
+        return await self._run(self.manager.list_sessions, guild_id, user_id)
+
+    async def list_archived(self, guild_id, user_id) -> list[str]:
+        return await self._run(self.manager.list_archived_sessions, guild_id, user_id)
+
+    async def apply_retention(self, guild_id, idle_days: float = 0, max_bytes: int = 0, batch: int = 50, busy=None) -> int:
+        """
+        Archives what the guild's retention policy selects, `batch` sessions per
+        trip to the DB thread so chat traffic can interleave, then compacts the
+        archive if restores have left it mostly garbage. Returns how many moved.
+
+        `busy` returns the (guild_id, user_id, session_name) keys with a reply
+        in flight; it is asked again right before each batch is queued, so a
+        reply that starts later reads the session after the batch has run.
+        """
+        candidates = await self._run(self.manager.retention_candidates, guild_id, idle_days, max_bytes, busy() if busy else set())
+        moved = 0
+        for start in range(0, len(candidates), batch):
+            moved += await self._run(self.manager.archive_sessions, guild_id, candidates[start:start + batch], busy() if busy else set())
+        if moved:
+            await self._durable()
+        await self._run(self.manager.compact_archive, guild_id)
+        return moved
+
+    async def archive_stats(self, guild_id) -> dict | None:
+        return await self._run(self.manager.archive_stats, guild_id)
+
+    async def list_all(self) -> list[tuple]:
+        return await self._run(self.manager.list_all_sessions)
+
+    async def search(self, guild_id, user_id, query: str, limit: int = 5) -> list[dict]:
+        return await self._run(self.manager.search_messages, guild_id, user_id, query, limit)
+
+    async def export_session(self, user_id, session_name: str):
+        return await self._run(self.manager.export_user_session, user_id, session_name)
+
+    async def export_user(self, user_id) -> dict:
+        return await self._run(self.manager.export_sessions_for_user, user_id)
+
+    async def export_all(self) -> dict:
+        return await self._run(self.manager.export_all_sessions)
+
+    async def export_all_to(self, export):
+        """
+        Streams every session into `export` (a SessionExport). Pending changes
+        are flushed on the DB thread first; the export itself runs on a worker
+        thread of its own, so chat traffic is not queued behind it. Archive
+        compaction waits until it is done; unreadable sessions end up in
+        `export.skipped`.
+        """
+        await self._run(self.manager.flush)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, export.run, self.manager.iter_all_sessions(skipped=export.skipped))
+
+    async def get_summary(self, guild_id, user_id, session_name: str) -> tuple[str, int] | None:
+        return await self._run(self.manager.get_summary, guild_id, user_id, session_name)
+
+    async def set_summary(self, guild_id, user_id, session_name: str, summary: str, cursor: int, basis: list[dict] | None = None) -> bool:
+        return await self._run(self.manager.set_summary, guild_id, user_id, session_name, summary, cursor, basis)
+
+    async def sync(self):
+        """Flushes dirty sessions and prunes the cache (filter_and_sync_sessions)."""
+        await self._run(self.manager.filter_and_sync_sessions)
+
+    async def flush_and_clear(self):
+        """Writes everything pending, then empties the in-memory cache."""
+        await self._run(self._flush_and_clear)
+
+    def _flush_and_clear(self):
+        self.manager.flush_all_to_disk()
+        self.manager.temp_sessions.clear()
+
+    def cache_stats(self) -> dict:
+        # Plain counter reads; fine to take from the event loop
+        stats = self.manager.cache_stats()
+        stats["max_entries"] = self.manager.temp_sessions.max_entries
+        stats["max_bytes"] = self.manager.temp_sessions.max_bytes
+        return stats
+
+    async def close(self):
+        await self._run(self.manager.close)
+        self._executor.shutdown(wait=True)
+        logger.debug("[DB] Session service stopped")
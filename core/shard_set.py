@@ -0,0 +1,95 @@
+#core/shard_set.py
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+
+class ShardSet:
+    """
+    Per-guild database files under `root/<guild_id>/<file_name>`.
+
+    Shards are opened on first use through `open_pool(path)` and kept in an
+    LRU of at most `max_open` handles. A shard is only closed once nobody is
+    using it, so the LRU can briefly run over its limit under load.
+    """
+
+    def __init__(self, root, file_name: str, open_pool, max_open: int = 32):
+        self.root = Path(root)
+        self.file_name = file_name
+        self.open_pool = open_pool
+        self.max_open = max_open
+        self._open = OrderedDict()  # {guild_id: SQLitePool}
+        self._leases = {}  # {guild_id: number of callers using the pool}
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.closed = 0
+
+    def path_for(self, guild_id) -> Path:
+        return self.root / str(int(guild_id)) / self.file_name
+
+    def known_ids(self) -> list[int]:
+        """Every guild that has a shard file on disk, plus any opened since."""
+        on_disk = {int(p.parent.name) for p in self.root.glob(f"*/{self.file_name}") if p.parent.name.isdigit()}
+        with self._lock:
+            on_disk.update(self._open)
+        return sorted(on_disk)
+
+    @contextmanager
+    def use(self, guild_id):
+        guild_id = int(guild_id)
+        with self._lock:
+            pool = self._open.get(guild_id)
+            if pool is None:
+                pool = self.open_pool(self.path_for(guild_id))
+                self._open[guild_id] = pool
+                self.opened += 1
+            self._open.move_to_end(guild_id)
+            self._leases[guild_id] = self._leases.get(guild_id, 0) + 1
+            victims = self._pick_victims()
+        self._close(victims)
+        try:
+            yield pool
+        finally:
+            with self._lock:
+                self._leases[guild_id] -= 1
+                if not self._leases[guild_id]:
+                    del self._leases[guild_id]
+                victims = self._pick_victims()
+            self._close(victims)
+
+    def _pick_victims(self) -> list:
+        victims = []
+        for guild_id in list(self._open):
+            if len(self._open) <= self.max_open:
+                break
+            if guild_id not in self._leases:
+                victims.append((guild_id, self._open.pop(guild_id)))
+        return victims
+
+    def _close(self, victims: list):
+        for guild_id, pool in victims:
+            pool.close()
+            self.closed += 1
+            logger.debug(f"[DB] Closed idle shard for guild {guild_id}")
+
+    def close(self):
+        with self._lock:
+            victims = list(self._open.items())
+            self._open.clear()
+        self._close(victims)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open": len(self._open), "max_open": self.max_open, "opened": self.opened, "closed": self.closed}
@@ -0,0 +1,88 @@
+#core/storage_codec.py
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+# Preset dictionary for raw deflate. Chat messages are short, so most of the gain
+# comes from back-references into text every conversation shares. Never edit a
+# dictionary in place: add a new one under a new header byte instead, since
+# stored rows name the dictionary they were written with.
+ZDICT_V1 = (
+    " I you it the to and of a in is that for on with this be are was have not but what can"
+    " do so if my your me we they he she there here just like know think about would could"
+    " should will really yeah yes no okay ok sure thanks thank please sorry maybe because"
+    " something anything everything nothing someone people time good great nice cool fun"
+    " want need make sure let me tell how why when where which who that's it's I'm you're"
+    " don't can't didn't doesn't isn't won't I'll I've I'd you'll you've there's what's"
+    " O-ni assistant user conversation remember question answer example, for example"
+    " Of course! Here is Here's a Let's Sounds like That sounds Hello! Hi! Hey! :) haha lol"
+    "\n\n- **\n1. 2. 3. ```\n"
+).encode("utf-8")
+
+HEADER_ZLIB_V1 = b"\x01"
+DICTIONARIES = {HEADER_ZLIB_V1: ZDICT_V1}
+
+
+class MessageCodec:
+    """
+    Storage codec for message content.
+
+    Plain rows are TEXT and are returned untouched, so databases written
+    before compression was turned on (or with it off) read back as-is.
+    Compressed rows are BLOBs: one header byte naming the dictionary,
+    followed by raw deflate. Content shorter than `min_size`, or that would
+    not shrink, is still stored as TEXT.
+    """
+
+    def __init__(self, enabled: bool = False, level: int = 6, min_size: int = 64):
+        self.enabled = enabled
+        self.level = level
+        self.min_size = min_size
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.compressed_rows = 0
+        self.plain_rows = 0
+
+    def encode(self, text: str) -> str | bytes:
+        raw = text.encode("utf-8")
+        self.raw_bytes += len(raw)
+        if self.enabled and len(raw) >= self.min_size:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15, zdict=ZDICT_V1)
+            packed = HEADER_ZLIB_V1 + compressor.compress(raw) + compressor.flush()
+            if len(packed) < len(raw):
+                self.stored_bytes += len(packed)
+                self.compressed_rows += 1
+                return packed
+        self.stored_bytes += len(raw)
+        self.plain_rows += 1
+        return text
+
+    def decode(self, value: str | bytes) -> str:
+        if isinstance(value, str):
+            return value
+        header, payload = value[:1], value[1:]
+        zdict = DICTIONARIES.get(header)
+        if zdict is None:
+            raise ValueError(f"Unknown storage codec header {header!r}")
+        decompressor = zlib.decompressobj(-15, zdict=zdict)
+        return (decompressor.decompress(payload) + decompressor.flush()).decode("utf-8")
+
+    def stats(self) -> dict:
+        """Counters for content written since this process started, not for what is already stored."""
+        return {
+            "enabled": self.enabled,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "compressed_rows": self.compressed_rows,
+            "plain_rows": self.plain_rows,
+            "ratio": self.raw_bytes / self.stored_bytes if self.stored_bytes else 1.0,
+        }
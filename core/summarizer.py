@@ -0,0 +1,129 @@
+#core/summarizer.py
+import asyncio
+import logging
+
+from core.scheduler import SchedulerFull
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a chat between a user and the assistant O-ni. "
+    "Merge the existing summary with the new turns into one concise summary. Keep names, facts, "
+    "decisions, preferences and open questions. Write plain prose, no preamble."
+)
+
+
+class SessionSummarizer:
+    """
+    Background compaction of long sessions.
+
+    Once a session has more than `trigger_messages` messages past its cursor,
+    everything except the last `keep_recent` messages is folded into a pinned
+    summary with a small model. Prompts then carry the summary plus the recent
+    turns only. The full transcript stays in the session for /export.
+    """
+
+    def __init__(self, llm, sessions, model: str, trigger_messages: int = 40, keep_recent: int = 12,
+                 scheduler=None, residency=None, max_chars: int | None = None):
+        self.llm = llm
+        self.sessions = sessions
+        self.model = model
+        self.trigger_messages = trigger_messages
+        self.keep_recent = keep_recent
+        self.scheduler = scheduler
+        self.residency = residency
+        self.max_chars = max_chars
+        self._running = {}  # {(guild_id, user_id, session_name): Task}
+
+    async def prompt_view(self, guild_id, user_id, session_name, history: list[dict]) -> tuple[str | None, list[dict]]:
+        """Splits a session into (pinned summary, turns the prompt still needs verbatim)."""
+        pinned = await self.sessions.get_summary(guild_id, user_id, session_name)
+        if not pinned:
+            return None, history
+        summary, cursor = pinned
+        if cursor > len(history):
+            # The session was rewritten underneath the summary; it no longer applies
+            return None, history
+        return summary, history[cursor:]
+
+    async def maybe_schedule(self, guild_id, user_id, session_name, history: list[dict]):
+        """Starts a compaction task if the session has outgrown the trigger length. Never waits on the model."""
+        key = (str(guild_id), str(user_id), session_name)
+        task = self._running.get(key)
+        if task is not None and not task.done():
+            return
+
+        pinned = await self.sessions.get_summary(guild_id, user_id, session_name)
+        cursor = pinned[1] if pinned and pinned[1] <= len(history) else 0
+        if len(history) - cursor <= self.trigger_messages:
+            return
+
+        task = asyncio.create_task(self._compact(key, list(history), pinned if cursor else None))
+        self._running[key] = task
+        # Only drop our own entry; a newer compaction may have replaced it after a cancel()
+        task.add_done_callback(lambda done: self._running.pop(key) if self._running.get(key) is done else None)
+
+    def cancel(self, guild_id, user_id, session_name):
+        """Abandons a running compaction, e.g. because the session was cleared or deleted."""
+        task = self._running.pop((str(guild_id), str(user_id), session_name), None)
+        if task is not None and not task.done():
+            task.cancel()
+            logger.debug(f"[SUMMARY] Cancelled compaction of '{session_name}' for user {user_id}")
+
+    async def _compact(self, key, history: list[dict], pinned):
+        guild_id, user_id, session_name = key
+        previous, cursor = pinned if pinned else ("", 0)
+
+        new_cursor = len(history) - self.keep_recent
+        # Keep the recent window starting on a user turn
+        while new_cursor > cursor and history[new_cursor].get("role") != "user":
+            new_cursor -= 1
+        if new_cursor <= cursor:
+            return
+
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in history[cursor:new_cursor])
+        messages = [
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": f"Existing summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"},
+        ]
+
+        keep_alive = None
+        if self.residency is not None:
+            self.residency.note_request(self.model)
+            keep_alive = self.residency.keep_alive_for(self.model)
+
+        try:
+            if self.scheduler is not None:
+                async with self.scheduler.submit(self.model, guild_id, user_id):
+                    summary = await self.llm.acall_model(self.model, messages, keep_alive=keep_alive, max_chars=self.max_chars)
+            else:
+                summary = await self.llm.acall_model(self.model, messages, keep_alive=keep_alive, max_chars=self.max_chars)
+        except SchedulerFull:
+            logger.debug(f"[SUMMARY] Scheduler busy, deferring compaction of '{session_name}' for user {user_id}")
+            return
+        except Exception as e:
+            logger.error(f"[SUMMARY] Compaction of '{session_name}' for user {user_id} failed: {e}", exc_info=True)
+            return
+
+        if summary.startswith("[O-ni]"):
+            logger.warning(f"[SUMMARY] Model could not summarize '{session_name}' for user {user_id}: {summary}")
+            return
+
+        # Pinned only if the session still holds the history it was computed from
+        if not await self.sessions.set_summary(guild_id, user_id, session_name, summary, new_cursor, basis=history):
+            return
+        logger.info(f"[SUMMARY] Compacted {new_cursor - cursor} messages of '{session_name}' for user {user_id} in guild {guild_id}")
+
+    async def close(self):
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+        self._running.clear()
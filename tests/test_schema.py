@@ -0,0 +1,115 @@
+#tests/test_schema.py
+import json
+import sqlite3
+
+import pytest
+
+from core.session_manager import SessionManager, SCHEMA_VERSION, check_query_plans
+
+
+def test_hot_statements_use_indexes():
+    assert check_query_plans() == {}
+
+
+@pytest.fixture
+def open_manager():
+    managers = []
+
+    def _open(db_path):
+        manager = SessionManager(db_path, max_sessions=5)
+        managers.append(manager)
+        return manager
+
+    yield _open
+    for manager in managers:
+        manager.close()
+
+
+def _column_types(db_path, table):
+    with sqlite3.connect(db_path) as conn:
+        return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table});")}
+
+
+def _user_version(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def test_migrates_v0_json_blobs(tmp_path, open_manager):
+    db_path = tmp_path / "sessions.db"
+    history = [{"role": "user", "content": "hello there"}, {"role": "assistant", "content": "hi"}]
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE sessions (
+                guild_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                session_name TEXT NOT NULL,
+                messages TEXT NOT NULL,
+                PRIMARY KEY (guild_id, user_id, session_name)
+            );
+        """)
+        conn.execute("INSERT INTO sessions VALUES ('1', '2', 'default', ?);", (json.dumps(history),))
+        conn.execute("INSERT INTO sessions VALUES ('1', '2', 'broken', 'not json');")
+
+    manager = open_manager(db_path)
+    assert manager.get_current_session("1", "2", "default") == history
+    assert sorted(manager.list_sessions("1", "2")) == ["broken", "default"]
+    assert [hit["session_name"] for hit in manager.search_messages("1", "2", "hello")] == ["default"]
+    manager.close()
+
+    assert _user_version(db_path) == SCHEMA_VERSION
+    # The undecodable row stays behind in sessions_legacy instead of being dropped
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT session_name FROM sessions_legacy;").fetchall() == [("broken",)]
+    assert _column_types(db_path, "sessions")["guild_id"] == "INTEGER"
+
+
+def test_migrates_v1_text_keys(tmp_path, open_manager):
+    db_path = tmp_path / "sessions.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript("""
+            CREATE TABLE sessions (
+                session_id INTEGER PRIMARY KEY,
+                guild_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                session_name TEXT NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                UNIQUE (guild_id, user_id, session_name)
+            );
+            CREATE TABLE session_messages (
+                message_id INTEGER PRIMARY KEY,
+                session_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                UNIQUE (session_id, seq)
+            );
+            CREATE TABLE session_summaries (
+                guild_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                session_name TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                cursor INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id, session_name)
+            );
+            INSERT INTO sessions VALUES (7, '1', '2', 'default', 2, 0);
+            INSERT INTO session_messages (session_id, seq, role, content) VALUES (7, 0, 'user', 'ramen tonight?');
+            INSERT INTO session_messages (session_id, seq, role, content) VALUES (7, 1, 'assistant', 'always');
+            INSERT INTO session_summaries VALUES ('1', '2', 'default', 'talked about food', 1);
+            PRAGMA user_version = 1;
+        """)
+
+    manager = open_manager(db_path)
+    assert manager.get_current_session(1, 2, "default") == [
+        {"role": "user", "content": "ramen tonight?"},
+        {"role": "assistant", "content": "always"},
+    ]
+    assert manager.get_summary(1, 2, "default") == ("talked about food", 1)
+    # v3 backfills the search index over messages that were already stored
+    assert [hit["seq"] for hit in manager.search_messages(1, 2, "ramen")] == [0]
+    manager.close()
+
+    assert _user_version(db_path) == SCHEMA_VERSION
+    assert _column_types(db_path, "sessions")["user_id"] == "INTEGER"
+    assert _column_types(db_path, "session_summaries")["guild_id"] == "INTEGER"
@@ -5,10 +5,13 @@ from utils.config_loader import load_config
 
 config = load_config()
 
+# Per-guild database; also holds the guild's sessions when session_sharding is on
+GUILD_DB_NAME = "oni_bot.db"
+
 def get_guild_db_path(guild_id):
     guild_folder = os.path.join(config["bfl_root"], str(guild_id))
     os.makedirs(guild_folder, exist_ok=True)
-    return os.path.join(guild_folder, "oni_bot.db")
+    return os.path.join(guild_folder, GUILD_DB_NAME)
 
 def create_guild_db(guild_id):
     db_path = get_guild_db_path(guild_id)
@@ -0,0 +1,61 @@
+# utils/guild_settings.py
+import os
+import json
+import logging
+
+from utils.config_loader import load_config
+
+config = load_config()
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    handler = logging.StreamHandler()
+    handler.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+# Settings are read on hot paths like /talk, so keep them in memory once loaded
+_settings_cache = {}
+
+
+def get_settings_file(guild_id):
+    path = os.path.join(config["bfl_root"], str(guild_id), "settings.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def load_guild_settings(guild_id) -> dict:
+    guild_id = str(guild_id)
+    if guild_id in _settings_cache:
+        return _settings_cache[guild_id]
+
+    settings = {}
+    path = get_settings_file(guild_id)
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                settings = json.load(f)
+        except json.JSONDecodeError as e:
+            logger.error(f"[ERROR] Failed to decode settings for guild {guild_id}: {e}", exc_info=True)
+    _settings_cache[guild_id] = settings
+    return settings
+
+
+def get_guild_setting(guild_id, key, default=None):
+    return load_guild_settings(guild_id).get(key, default)
+
+
+def set_guild_setting(guild_id, key, value):
+    settings = dict(load_guild_settings(guild_id))
+    settings[key] = value
+    path = get_settings_file(guild_id)
+    try:
+        with open(path, "w") as f:
+            json.dump(settings, f, indent=4)
+        _settings_cache[str(guild_id)] = settings
+        logger.debug(f"[DEBUG] Saved setting {key}={value} for guild {guild_id}")
+    except Exception as e:
+        logger.error(f"[ERROR] Failed to save settings for guild {guild_id}: {e}", exc_info=True)
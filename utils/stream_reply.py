@@ -0,0 +1,83 @@
+# utils/stream_reply.py
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+if not logger.hasHandlers():
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+DISCORD_MESSAGE_LIMIT = 2000
+
+
+class StreamingReply:
+    """
+    Renders a growing model response into interaction followups.
+
+    The first followup is posted as soon as visible text arrives. After that the
+    last message is edited at most once per `edit_interval` seconds, and the text
+    rolls over into a new followup whenever it crosses the 2000-char limit.
+    """
+
+    def __init__(self, interaction, edit_interval: float = 1.5, limit: int = DISCORD_MESSAGE_LIMIT):
+        self.interaction = interaction
+        self.edit_interval = edit_interval
+        self.limit = limit
+        self.text = ""
+        self.messages = []   # sent WebhookMessages, one per page
+        self.rendered = []   # content currently shown in each message
+        self.last_render = 0.0
+        self.first_token_at = None
+        self.started_at = time.monotonic()
+
+    def _pages(self, text: str) -> list[str]:
+        return [text[i:i + self.limit] for i in range(0, len(text), self.limit)]
+
+    async def feed(self, chunk: str):
+        """Appends a chunk and renders if the debounce window has passed."""
+        self.text += chunk
+        if not self.messages:
+            if self.text.strip():
+                self.first_token_at = time.monotonic()
+                logger.debug(f"[STREAM] First visible token after {self.first_token_at - self.started_at:.2f}s")
+                await self._render()
+            return
+        if time.monotonic() - self.last_render >= self.edit_interval:
+            await self._render()
+
+    async def finish(self, final_text: str | None = None):
+        """Renders the final text, ignoring the debounce window."""
+        if final_text is not None:
+            self.text = final_text
+        if not self.text.strip():
+            self.text = "[O-ni] No response returned."
+        await self._render()
+
+        # Drop trailing pages if the final text ended up shorter than what was streamed
+        for message in self.messages[len(self._pages(self.text)):]:
+            try:
+                await message.delete()
+            except Exception as e:
+                logger.warning(f"[STREAM] Could not delete surplus message: {e}")
+        del self.messages[len(self._pages(self.text)):]
+        del self.rendered[len(self.messages):]
+        logger.debug(f"[STREAM] Finished streaming {len(self.text)} chars over {len(self.messages)} message(s)")
+
+    async def _render(self):
+        self.last_render = time.monotonic()
+        for index, page in enumerate(self._pages(self.text)):
+            if not page.strip():
+                break  # Discord rejects whitespace-only messages; wait for more text
+            if index < len(self.messages):
+                if self.rendered[index] != page:
+                    await self.messages[index].edit(content=page)
+                    self.rendered[index] = page
+            else:
+                message = await self.interaction.followup.send(page, wait=True)
+                self.messages.append(message)
+                self.rendered.append(page)